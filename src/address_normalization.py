@@ -0,0 +1,100 @@
+import timeit
+
+import numpy as np
+
+
+# Characters dropped by every normalization mode
+PUNCTUATION = (",", ".")
+
+
+def _strip_punctuation(address):
+    # Chained str.replace beats both re.sub and str.translate on short strings
+    for char in PUNCTUATION:
+        address = address.replace(char, "")
+    return address
+
+
+def normalize(address, mode="compact"):
+    """
+    Normalizes an address for comparison in a single pass of string builtins.
+
+    Args:
+        address (str): The address to be normalized.
+        mode (str): "compact" drops whitespace, commas and periods and lowercases;
+            "count" drops commas and periods, lowercases and strips.
+
+    Returns:
+        str: The normalized address.
+    """
+    if mode == "count":
+        return _strip_punctuation(address).lower().strip()
+    # str.split() splits on exactly the characters re's \s matches
+    return "".join(_strip_punctuation(address.lower()).split())
+
+
+def normalize_many(addresses, mode="compact"):
+    """
+    Normalizes many addresses at once.
+
+    NumPy string arrays are converted to a list and back, since np.char
+    operations work on fixed-width buffers and are slower than the builtins.
+
+    Args:
+        addresses (list or numpy.ndarray): The addresses to be normalized.
+        mode (str): See normalize.
+
+    Returns:
+        list or numpy.ndarray: The normalized addresses, in the input's type.
+    """
+    if isinstance(addresses, np.ndarray):
+        return np.array(
+            [normalize(address, mode) for address in addresses.tolist()], dtype=str
+        ).reshape(addresses.shape)
+    return [normalize(address, mode) for address in addresses]
+
+
+def benchmark(count=100000, repeat=5):
+    """
+    Times normalize_many against the regex passes it replaced.
+
+    Args:
+        count (int): Number of addresses per run.
+        repeat (int): Number of runs; the best one is reported.
+
+    Returns:
+        dict: Best seconds per run for each implementation.
+    """
+    import re
+
+    addresses = [
+        f"{i % 997} N. Main St., Apt {i % 31}, Austin, TX {78700 + i % 50}"
+        for i in range(count)
+    ]
+    array = np.array(addresses)
+
+    def regex_compact():
+        for address in addresses:
+            re.sub(r"(\b[a-z]{2}\b),\1", r"\1", address)
+            re.sub(r"[\s,]", "", address.lower())
+            re.sub(r"[\s,.]", "", address.lower())
+
+    def regex_count():
+        for address in addresses:
+            re.sub(r"[.,]", "", address).lower().strip()
+
+    timings = {
+        "regex_compact": regex_compact,
+        "regex_count": regex_count,
+        "compact": lambda: normalize_many(addresses),
+        "count": lambda: normalize_many(addresses, mode="count"),
+        "compact_array": lambda: normalize_many(array),
+    }
+    return {
+        name: min(timeit.repeat(run, number=1, repeat=repeat))
+        for name, run in timings.items()
+    }
+
+
+if __name__ == "__main__":
+    for name, seconds in benchmark().items():
+        print(f"{name:>14}: {seconds:.4f}s")
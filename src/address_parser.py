@@ -1,6 +1,93 @@
-import usaddress
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from parse_cache import tag_address
+from parsed_address import ParsedAddress, ParsedAddressBatch
+
+
+class StateResolver:
+    def __init__(self, state_abbreviation_map):
+        """
+        Resolves free-form state strings to USPS abbreviations.
+
+        Abbreviations and full names (in either case, with or without dots)
+        resolve through a dict lookup. Anything else falls back to the
+        closest label in a character n-gram matrix that is built once here.
+
+        Args:
+            state_abbreviation_map (dict): Abbreviation to full state name.
+        """
+        self.abbreviations = list(state_abbreviation_map.keys())
+        self.lookup = {}
+        for abbreviation, name in state_abbreviation_map.items():
+            self.lookup[self.normalize(abbreviation)] = abbreviation
+            self.lookup[self.normalize(name)] = abbreviation
+
+        # Abbreviations come first so an input sharing no n-gram with any
+        # label still resolves to the first abbreviation, as before.
+        labels = [abbreviation.lower() for abbreviation in self.abbreviations]
+        labels += [name.lower() for name in state_abbreviation_map.values()]
+        self.label_states = np.array(self.abbreviations + self.abbreviations)
+        self.vectorizer = CountVectorizer(analyzer="char_wb", ngram_range=(1, 3))
+        self.label_matrix = normalize(self.vectorizer.fit_transform(labels)).T.tocsr()
+
+    @staticmethod
+    def normalize(state):
+        return " ".join(state.replace(".", "").lower().split())
+
+    def resolve(self, state):
+        """
+        Resolves a single state string.
+
+        Args:
+            state (str): The state to be resolved.
+
+        Returns:
+            str: The two-letter state abbreviation.
+        """
+        return self.resolve_many([state])[0]
+
+    def resolve_many(self, states):
+        """
+        Resolves many state strings with one sparse matrix product for the misses.
+
+        Args:
+            states (list): The states to be resolved.
+
+        Returns:
+            list: The two-letter state abbreviation for each input.
+        """
+        normalized = [self.normalize(state) for state in states]
+        resolved = [self.lookup.get(state) for state in normalized]
+        pending = [index for index, state in enumerate(resolved) if state is None]
+        if pending:
+            vectors = normalize(
+                self.vectorizer.transform([normalized[index] for index in pending])
+            )
+            best = np.asarray((vectors @ self.label_matrix).argmax(axis=1)).ravel()
+            for index, label in zip(pending, best):
+                resolved[index] = str(self.label_states[label])
+        return resolved
+
+
+_state_resolver = None
+_state_resolver_lock = threading.Lock()
+
+
+def get_state_resolver(state_abbreviation_map):
+    """Returns the process-wide StateResolver, building it on first use."""
+    global _state_resolver
+    if _state_resolver is None:
+        with _state_resolver_lock:
+            if _state_resolver is None:
+                _state_resolver = StateResolver(state_abbreviation_map)
+    return _state_resolver
 
 
 class AddressStandardizer:
@@ -109,14 +196,38 @@ class AddressStandardizer:
             "WI": "Wisconsin",
             "WY": "Wyoming",
         }
+        self.street_predirectional_map = {
+            "n": "North",
+            "s": "South",
+            "e": "East",
+            "w": "West",
+        }
+        self.street_post_map = {
+            "rd": "Road",
+            "cres": "Crescent",
+            "cv": "Cove",
+            "dr": "Drive",
+            "aly": "Alley",
+            "st": "Street",
+            "pkwy": "Parkway",
+            "cir": "Circle",
+            "blvd": "Boulevard",
+            "cmp": "Compound",
+            "pl": "Place",
+            "ave": "Avenue",
+            "ter": "Terrace",
+            "cm": "Common",
+            "hwy": "Highway",
+            "ln": "Lane",
+            "cmpd": "Compound",
+            "sq": "Square",
+            "ct": "Court",
+        }
+        self.state_resolver = get_state_resolver(self.state_abbreviation_map)
 
     def get_max_cosine_similarity(self, input_str, abbreviations):
-        # Cosine similarity calculation
-        vectorizer = CountVectorizer(analyzer="char")
-        vectors = vectorizer.fit_transform([input_str] + abbreviations)
-        cosine_similarities = cosine_similarity(vectors[0:1], vectors[1:]).flatten()
-        max_index = cosine_similarities.argmax()
-        return self.us_state_abbreviations[max_index]
+        # Exact abbreviation/full-name lookup, then the precomputed n-gram matrix
+        return self.state_resolver.resolve(input_str)
 
     def is_valid_state(self, state):
         """
@@ -139,7 +250,7 @@ class AddressStandardizer:
         Returns:
             dict: A dictionary containing the address components.
         """
-        return usaddress.tag(address)[0]
+        return tag_address(address)[0]
 
     def standardize_street_predirectional(self, street_name):
         """
@@ -151,14 +262,13 @@ class AddressStandardizer:
         Returns:
             str: The standardized street name.
         """
-        street_map = {"n": "North", "s": "South", "e": "East", "w": "West"}
         if not street_name in [
             "west",
             "east",
             "north",
             "south",
         ]:  # streetname are normalized in lowercase
-            return street_map[street_name]
+            return self.street_predirectional_map[street_name]
 
     def standardize_street_postype(self, street_name):
         """
@@ -170,30 +280,9 @@ class AddressStandardizer:
         Returns:
             str: The standardized street name.
         """
-        street_post_map = {
-            "rd": "Road",
-            "cres": "Crescent",
-            "cv": "Cove",
-            "dr": "Drive",
-            "aly": "Alley",
-            "st": "Street",
-            "pkwy": "Parkway",
-            "cir": "Circle",
-            "blvd": "Boulevard",
-            "cmp": "Compound",
-            "pl": "Place",
-            "ave": "Avenue",
-            "ter": "Terrace",
-            "cm": "Common",
-            "hwy": "Highway",
-            "ln": "Lane",
-            "cmpd": "Compound",
-            "sq": "Square",
-            "ct": "Court",
-        }
-        if street_name in street_post_map.keys():
-            return street_post_map[street_name]
-        elif street_name in street_post_map.values():
+        if street_name in self.street_post_map.keys():
+            return self.street_post_map[street_name]
+        elif street_name in self.street_post_map.values():
             return street_name  # if the street name is already in the map then return the same street name
 
     # def standardize_place_name(self, place_name):
@@ -221,7 +310,22 @@ class AddressStandardizer:
         Returns:
             str: The standardized address.
         """
-        parsed_address = self.extract_address_components(address)
+        parsed_address = ParsedAddress.from_tagged(
+            self.extract_address_components(address)
+        )
+        return self.standardize_parsed(parsed_address)
+
+    def standardize_parsed(self, parsed_address, state=None):
+        """
+        Standardize an already parsed address.
+
+        Args:
+            parsed_address (ParsedAddress): The parsed address components.
+            state (str): The resolved state abbreviation, if already known.
+
+        Returns:
+            str: The standardized address.
+        """
         AddressNumber = parsed_address.get("AddressNumber", "")
         StreetName = parsed_address.get("StreetName", "")
         StreetNamePreDirectional = parsed_address.get("StreetNamePreDirectional", "")
@@ -246,14 +350,10 @@ class AddressStandardizer:
         StateName = parsed_address.get("StateName", "")
         ZipCode = parsed_address.get("ZipCode", "")
 
-        if self.is_valid_state(StateName):
-
-            StateName = StateName
-            # So the Statename can be also the full statename which is valid but is valid_statement will be false
-        elif StateName in self.us_state_abbreviations:
-            StateName = self.us_state_abbreviations[StateName]
-
-        else:
+        if state is not None:
+            StateName = state
+        elif not self.is_valid_state(StateName):
+            # Full state names, lowercase abbreviations and typos resolve here
             StateName = self.get_max_cosine_similarity(
                 StateName, self.us_state_abbreviations
             )
@@ -280,3 +380,89 @@ class AddressStandardizer:
         full_address_parts = [street_address, occupancy, city_state_zip]
         full_address = ", ".join(part for part in full_address_parts if part)
         return full_address
+
+    def standardize_batch(self, batch):
+        """
+        Standardize every row of a ParsedAddressBatch, resolving all states at once.
+
+        Args:
+            batch (ParsedAddressBatch): The parsed addresses.
+
+        Returns:
+            list: The standardized address per row, or None where parsing failed.
+        """
+        states = [value or "" for value in batch.columns["StateName"]]
+        unresolved = [
+            index
+            for index, state in enumerate(states)
+            if batch.records[index] is not None and not self.is_valid_state(state)
+        ]
+        resolved = self.state_resolver.resolve_many([states[i] for i in unresolved])
+        for index, state in zip(unresolved, resolved):
+            states[index] = state
+        return [
+            self.standardize_parsed(record, state) if record is not None else None
+            for record, state in zip(batch.records, states)
+        ]
+
+    def standardize_many(self, addresses, chunk_size=1000, workers=None):
+        """
+        Standardize a stream of addresses, yielding results in input order.
+
+        The input is consumed in chunks that are parsed across a process pool.
+        At most two chunks per worker are in flight, so memory stays bounded
+        regardless of the input size.
+
+        Args:
+            addresses (iterable): The addresses to be standardized.
+            chunk_size (int): Number of addresses sent to a worker at a time.
+            workers (int): Number of worker processes. Defaults to the CPU count;
+                1 standardizes in the current process.
+
+        Yields:
+            str: The standardized address.
+        """
+        iterator = iter(addresses)
+        chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+        workers = workers or os.cpu_count() or 1
+
+        if workers == 1:
+            for chunk in chunks:
+                for address in chunk:
+                    yield self.standardize(address)
+            return
+
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_standardize_worker
+        )
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(executor.submit(_standardize_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+
+_worker_standardizer = None
+
+
+def _init_standardize_worker():
+    global _worker_standardizer
+    _worker_standardizer = AddressStandardizer()
+
+
+def _standardize_chunk(addresses):
+    batch = ParsedAddressBatch.from_addresses(
+        addresses,
+        parser=lambda address: ParsedAddress.from_tagged(
+            _worker_standardizer.extract_address_components(address)
+        ),
+    )
+    for error in batch.errors:
+        if error is not None:
+            raise error
+    return _worker_standardizer.standardize_batch(batch)
@@ -1,60 +1,487 @@
+import re
+from collections import Counter, defaultdict
 from address_parser import AddressStandardizer
 import usaddress
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
+from embedding_cache import EmbeddingCache
+from model_registry import DEFAULT_MODEL_NAME, get_model
+from parse_cache import tag_address
+from parsed_address import ParsedAddress, ParsedAddressBatch
 
 
-model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+standardizer = AddressStandardizer()
+embedding_cache = EmbeddingCache(
+    lambda values: get_model().encode(values), namespace=DEFAULT_MODEL_NAME
+)
+
+
+def configure_embedding_cache(maxsize=50000, path=None):
+    """
+    Replaces the component embedding cache used by compare_addresses.
+
+    Args:
+        maxsize (int): Maximum number of vectors kept in memory.
+        path (str): Optional SQLite file that persists vectors across restarts.
+
+    Returns:
+        EmbeddingCache: The newly installed cache.
+    """
+    global embedding_cache
+    embedding_cache.close()
+    embedding_cache = EmbeddingCache(
+        lambda values: get_model().encode(values),
+        maxsize=maxsize,
+        path=path,
+        namespace=DEFAULT_MODEL_NAME,
+    )
+    return embedding_cache
 
 
 def standarize_address(address):
-    standardizer = AddressStandardizer()
     standardized_address = standardizer.standardize(address)
     return standardized_address
 
 
-def compare_addresses(address1, address2, similarity_threshold=0.8):
+SIMILARITY_KEYS = [
+    "StreetNamePreDirectional",
+    "StreetName",
+    "StreetNamePostType",
+    "PlaceName",
+    "StateName",
+]
+
+
+NGRAM_ACCEPT_THRESHOLD = 0.9
+NGRAM_REJECT_THRESHOLD = 0.2
+
+cascade_stats = Counter()
+
+
+def _build_abbreviation_tables(standardizer):
+    tables = {
+        "StreetNamePreDirectional": standardizer.street_predirectional_map,
+        "StreetNamePostType": standardizer.street_post_map,
+        "StateName": standardizer.state_abbreviation_map,
+    }
+    abbreviation_tables = {}
+    for key, mapping in tables.items():
+        table = {short.lower(): full.lower() for short, full in mapping.items()}
+        table.update({full.lower(): full.lower() for full in mapping.values()})
+        abbreviation_tables[key] = table
+    return abbreviation_tables
+
+
+ABBREVIATION_TABLES = _build_abbreviation_tables(standardizer)
+
+
+def normalize_component(value):
+    return " ".join(re.sub(r"[.,]", "", value.lower()).split())
+
+
+def ngram_similarity(value1, value2, n=2):
+    """
+    Dice coefficient over padded character n-grams.
+
+    Args:
+        value1 (str): The first normalized component.
+        value2 (str): The second normalized component.
+        n (int): The n-gram length.
+
+    Returns:
+        float: The similarity between 0 and 1.
+    """
+    padded1, padded2 = f" {value1} ", f" {value2} "
+    grams1 = Counter(padded1[i : i + n] for i in range(len(padded1) - n + 1))
+    grams2 = Counter(padded2[i : i + n] for i in range(len(padded2) - n + 1))
+    total = sum(grams1.values()) + sum(grams2.values())
+    if not total:
+        return 0.0
+    return 2 * sum((grams1 & grams2).values()) / total
+
+
+def cascade_component(key, value1, value2):
+    """
+    Tries to decide a component comparison without the embedding model.
+
+    The tiers run cheapest first: exact match after normalization, the
+    AddressStandardizer abbreviation tables, then a character n-gram score.
+    The tier that decides the comparison is counted in cascade_stats.
+
+    Args:
+        key (str): The usaddress label being compared.
+        value1 (str): The first component value.
+        value2 (str): The second component value.
+
+    Returns:
+        bool: The decision, or None if the pair still needs the embedding model.
+    """
+    value1 = normalize_component(value1)
+    value2 = normalize_component(value2)
+    if value1 == value2:
+        cascade_stats["exact"] += 1
+        return True
+
+    table = ABBREVIATION_TABLES.get(key)
+    if table and value1 in table and value2 in table:
+        cascade_stats["abbreviation"] += 1
+        return table[value1] == table[value2]
+
+    score = ngram_similarity(value1, value2)
+    if score >= NGRAM_ACCEPT_THRESHOLD:
+        cascade_stats["ngram"] += 1
+        return True
+    if score <= NGRAM_REJECT_THRESHOLD:
+        cascade_stats["ngram"] += 1
+        return False
+    return None
+
+
+def get_cascade_stats():
+    """Returns how many component comparisons each cascade tier resolved."""
+    return {
+        tier: cascade_stats[tier]
+        for tier in ["exact", "abbreviation", "ngram", "embedding"]
+    }
+
+
+def reset_cascade_stats():
+    cascade_stats.clear()
+
+
+def parse_for_comparison(address):
+    """
+    Parses an address with usaddress and splits a "City, State" PlaceName.
+
+    Args:
+        address (str): The address to be parsed.
+
+    Returns:
+        ParsedAddress: The parsed address components.
+
+    Raises:
+        usaddress.RepeatedLabelError: If the address cannot be parsed.
+    """
+    parsed_address, _ = tag_address(address)
+    place_name = parsed_address.get("PlaceName", "")
+    if ", " in place_name:
+        city, state_in_place = place_name.split(", ", 1)
+        parsed_address["PlaceName"] = city
+        parsed_address["StateName"] = (
+            state_in_place
+            if state_in_place != parsed_address.get("StateName", "")
+            else parsed_address.get("StateName", "")
+        )
+    return ParsedAddress.from_tagged(parsed_address)
+
+
+def compare_addresses(address1, address2, similarity_threshold=0.8, cascade=False):
     try:
-        parsed1, _ = usaddress.tag(address1)
-        parsed2, _ = usaddress.tag(address2)
+        parsed1 = parse_for_comparison(address1)
+        parsed2 = parse_for_comparison(address2)
     except usaddress.RepeatedLabelError as e:
         return f"Error parsing addresses: {e}"
 
-    for parsed_address in [parsed1, parsed2]:
-        place_name = parsed_address.get("PlaceName", "")
-        if ", " in place_name:
-            city, state_in_place = place_name.split(", ", 1)
-            parsed_address["PlaceName"] = city
-            parsed_address["StateName"] = (
-                state_in_place
-                if state_in_place != parsed_address.get("StateName", "")
-                else parsed_address.get("StateName", "")
-            )
-
     if parsed1.get("AddressNumber") != parsed2.get("AddressNumber"):
         return False
     if parsed1.get("ZipCode") != parsed2.get("ZipCode"):
         return False
 
-    similarity_keys = [
-        "StreetNamePreDirectional",
-        "StreetName",
-        "StreetNamePostType",
-        "PlaceName",
-        "StateName",
-    ]
-    for key in similarity_keys:
+    for key in SIMILARITY_KEYS:
         value1 = parsed1.get(key, "").lower()
         value2 = parsed2.get(key, "").lower()
 
         if not value1 or not value2:
             continue
 
+        if cascade:
+            decision = cascade_component(key, value1, value2)
+            if decision is False:
+                return False
+            if decision:
+                continue
+            cascade_stats["embedding"] += 1
+
         # Compute similarity score
-        embeddings1 = model.encode(value1, convert_to_tensor=True)
-        embeddings2 = model.encode(value2, convert_to_tensor=True)
-        similarity_score = util.cos_sim(embeddings1, embeddings2).item()
+        embeddings1 = embedding_cache.get(value1)
+        embeddings2 = embedding_cache.get(value2)
+        similarity_score = float(np.dot(embeddings1, embeddings2))
 
         if similarity_score < similarity_threshold:
             return False
 
     return True
+
+
+def compare_addresses_many(address_pairs, similarity_threshold=0.8, cascade=False):
+    """
+    Compares many address pairs with a single batched embedding call.
+
+    Every distinct address is parsed once and every distinct component
+    string is encoded once, then all component similarities are scored
+    together.
+
+    Args:
+        address_pairs (list): (address1, address2) tuples to be compared.
+        similarity_threshold (float): Minimum cosine similarity per component.
+        cascade (bool): Resolve cheap component comparisons before embedding.
+
+    Returns:
+        list: The compare_addresses result for each pair, in input order.
+    """
+    row = {}
+    for pair in address_pairs:
+        for address in pair:
+            row.setdefault(address, len(row))
+    batch = ParsedAddressBatch.from_addresses(row, parser=parse_for_comparison)
+    left_rows = [row[address1] for address1, _ in address_pairs]
+    right_rows = [row[address2] for _, address2 in address_pairs]
+    components_equal = batch.pair_equality(left_rows, right_rows)
+
+    results = []
+    values = {}
+    left, right, owners = [], [], []
+    for index, (row1, row2) in enumerate(zip(left_rows, right_rows)):
+        error = batch.errors[row1] or batch.errors[row2]
+        if error:
+            results.append(f"Error parsing addresses: {error}")
+            continue
+
+        if not components_equal[index]:
+            results.append(False)
+            continue
+
+        parsed1, parsed2 = batch.records[row1], batch.records[row2]
+        results.append(True)
+        pending = []
+        for key in SIMILARITY_KEYS:
+            value1 = parsed1.get(key, "").lower()
+            value2 = parsed2.get(key, "").lower()
+            if not value1 or not value2:
+                continue
+            if cascade:
+                decision = cascade_component(key, value1, value2)
+                if decision is False:
+                    results[index] = False
+                    break
+                if decision:
+                    continue
+            pending.append((value1, value2))
+        if results[index] is False:
+            continue
+
+        if cascade:
+            cascade_stats["embedding"] += len(pending)
+        for value1, value2 in pending:
+            left.append(values.setdefault(value1, len(values)))
+            right.append(values.setdefault(value2, len(values)))
+            owners.append(index)
+
+    if owners:
+        embeddings = embedding_cache.get_many(list(values))
+        similarity_scores = np.einsum(
+            "ij,ij->i", embeddings[left], embeddings[right]
+        )
+        for index in np.asarray(owners)[similarity_scores < similarity_threshold]:
+            results[index] = False
+
+    return results
+
+
+class ComponentSimilarity:
+    def __init__(self, addresses):
+        """
+        Embeds every distinct component of a set of addresses once.
+
+        For each similarity key, every row maps to a row of a unit-normalized
+        embedding matrix (or -1 when the component is missing), so component
+        similarities between any two groups of rows are one matrix product.
+
+        Args:
+            addresses (list): Distinct addresses, one row each.
+        """
+        self.batch = ParsedAddressBatch.from_addresses(
+            addresses, parser=parse_for_comparison
+        )
+        self.error_mask = ~self.batch.parsed_mask
+
+        values = {}
+        self.component_rows = {}
+        for key in SIMILARITY_KEYS:
+            rows = []
+            for value in self.batch.columns[key]:
+                value = (value or "").lower()
+                rows.append(values.setdefault(value, len(values)) if value else -1)
+            self.component_rows[key] = np.array(rows, dtype=np.intp)
+        self.embeddings = embedding_cache.get_many(list(values))
+
+    def match(self, rows1, rows2, similarity_threshold=0.8):
+        """
+        Applies compare_addresses to every pair of two groups of rows at once.
+
+        Args:
+            rows1 (array-like): Row indices of the first group.
+            rows2 (array-like): Row indices of the second group.
+            similarity_threshold (float): Minimum cosine similarity per component.
+
+        Returns:
+            tuple: A boolean matrix of matching pairs and a float matrix with
+            the mean similarity of the compared components.
+        """
+        rows1 = np.asarray(rows1, dtype=np.intp)
+        rows2 = np.asarray(rows2, dtype=np.intp)
+        matched = (
+            self.batch.address_numbers[rows1][:, None]
+            == self.batch.address_numbers[rows2][None, :]
+        ) & (self.batch.zip_codes[rows1][:, None] == self.batch.zip_codes[rows2][None, :])
+        score_sum = np.zeros(matched.shape, dtype=np.float32)
+        compared = np.zeros(matched.shape, dtype=np.float32)
+
+        for key in SIMILARITY_KEYS:
+            component1 = self.component_rows[key][rows1]
+            component2 = self.component_rows[key][rows2]
+            present = (component1 >= 0)[:, None] & (component2 >= 0)[None, :]
+            if not present.any():
+                continue
+            scores = self.embeddings[np.maximum(component1, 0)] @ self.embeddings[
+                np.maximum(component2, 0)
+            ].T
+            matched &= ~present | (scores >= similarity_threshold)
+            score_sum += np.where(present, scores, 0)
+            compared += present
+
+        # compare_addresses returns a (truthy) error string for unparseable input
+        errors = self.error_mask[rows1][:, None] | self.error_mask[rows2][None, :]
+        matched |= errors
+        return matched, score_sum / np.maximum(compared, 1)
+
+
+def assign_addresses(addresses, bucket_addresses, similarity_threshold=0.8):
+    """
+    Assigns addresses to buckets using matrix-wide component similarities.
+
+    Each address joins the existing bucket with the highest mean component
+    similarity among those compare_addresses would accept. Addresses with no
+    matching bucket open their own, which later addresses may then join.
+
+    Args:
+        addresses (list): The addresses to be assigned, in arrival order.
+        bucket_addresses (list): The addresses of the existing buckets.
+        similarity_threshold (float): Minimum cosine similarity per component.
+
+    Returns:
+        dict: Each distinct address mapped to the address of its bucket.
+    """
+    distinct = list(dict.fromkeys(addresses))
+    bucket_addresses = [address for address in bucket_addresses if address]
+    rows = {
+        address: row
+        for row, address in enumerate(dict.fromkeys(bucket_addresses + distinct))
+    }
+    similarity = ComponentSimilarity(list(rows))
+    address_rows = [rows[address] for address in distinct]
+
+    assignments = {}
+    unmatched = distinct
+    if bucket_addresses:
+        matched, scores = similarity.match(
+            address_rows,
+            [rows[address] for address in bucket_addresses],
+            similarity_threshold,
+        )
+        best = np.where(matched, scores, -np.inf).argmax(axis=1)
+        unmatched = []
+        for address, row_matched, column in zip(distinct, matched, best):
+            if row_matched.any():
+                assignments[address] = bucket_addresses[column]
+            else:
+                unmatched.append(address)
+
+    # Opened buckets only need to be checked within the same blocking key
+    block_keys = similarity.batch.block_keys()
+    opened = defaultdict(list)
+    opened_unparsed = []
+    opened_all = []
+    for address in unmatched:
+        key = block_keys[rows[address]]
+        candidates = opened_all if key is None else opened[key] + opened_unparsed
+        if candidates:
+            matched, scores = similarity.match(
+                [rows[address]],
+                [rows[bucket] for bucket in candidates],
+                similarity_threshold,
+            )
+            if matched[0].any():
+                assignments[address] = candidates[
+                    int(np.where(matched[0], scores[0], -np.inf).argmax())
+                ]
+                continue
+        if key is None:
+            opened_unparsed.append(address)
+        else:
+            opened[key].append(address)
+        opened_all.append(address)
+        assignments[address] = address
+    return assignments
+
+
+def address_block_key(address):
+    """Returns the blocking key used to pre-filter candidates for compare_addresses.
+
+    compare_addresses rejects a pair unless AddressNumber and ZipCode are
+    equal, so only addresses sharing this key can ever match. A component
+    missing from the address stays None in the key, which groups it with
+    the other addresses missing that same component.
+
+    Args:
+        address (str): The address to be keyed.
+
+    Returns:
+        tuple: (AddressNumber, ZipCode), or None if the address cannot be parsed.
+    """
+    try:
+        return ParsedAddress.from_address(address).block_key
+    except usaddress.RepeatedLabelError:
+        return None
+
+
+class AddressBlockIndex:
+    def __init__(self):
+        self.blocks = defaultdict(list)
+        # compare_addresses treats a parse error as a match, so unparseable
+        # addresses have to stay candidates for every lookup.
+        self.unparsed = []
+        self.order = {}
+
+    def add(self, address):
+        """
+        Registers an address as a match candidate.
+
+        Args:
+            address (str): The bucket address to be indexed.
+        """
+        if address in self.order:
+            return
+        self.order[address] = len(self.order)
+        key = address_block_key(address)
+        if key is None:
+            self.unparsed.append(address)
+        else:
+            self.blocks[key].append(address)
+
+    def candidates(self, address):
+        """
+        Returns the indexed addresses that can match the given address.
+
+        Args:
+            address (str): The address to be matched.
+
+        Returns:
+            list: Candidate addresses in the order they were added.
+        """
+        key = address_block_key(address)
+        if key is None:
+            return list(self.order)
+        block = self.blocks.get(key, [])
+        if not self.unparsed:
+            return block
+        return sorted(block + self.unparsed, key=self.order.__getitem__)
@@ -1,10 +1,9 @@
-import re
+import address_normalization
+from unit_normalization import canonical_unit, canonical_unit_map
 
 
 def normalize_address_for_count(address):
-    address = re.sub(r"[.,]", "", address)
-    address = address.lower().strip()
-    return address
+    return address_normalization.normalize(address, mode="count")
 
 
 def find_rent_missing(lease_addresses, rent_addresses):
@@ -18,15 +17,15 @@ def find_rent_missing(lease_addresses, rent_addresses):
     print(rent_addresses)
     print("---------------------------------")
     normalized_lease = {
-        normalize_address_for_count(addr): addr for addr in lease_addresses
+        addr: normalize_address_for_count(addr) for addr in lease_addresses
     }
     normalized_rent = {
         normalize_address_for_count(addr): addr for addr in rent_addresses
     }
     rent_missing_address = [
         address
-        for address in lease_addresses
-        if normalize_address_for_count(address) not in normalized_rent
+        for address, normalized in normalized_lease.items()
+        if normalized not in normalized_rent
     ]
     return set(rent_missing_address), len(rent_missing_address)
 
@@ -42,7 +41,7 @@ def find_rent_missing(lease_addresses, rent_addresses):
 
 
 def find_lease_missing(unmatched_leases, unmatched_rentrolls):
-    lease_units = {lease["unit_number"].strip().lower() for lease in unmatched_leases}
+    lease_units = {canonical_unit(lease["unit_number"]) for lease in unmatched_leases}
 
     missing_addresses_with_units = []
     missing_counts = []
@@ -51,7 +50,9 @@ def find_lease_missing(unmatched_leases, unmatched_rentrolls):
         address = rentroll["property_address"].strip()
         units = [unit.strip().lower() for unit in rentroll["unit_numbers"]]
 
-        missing_units = [unit for unit in units if unit not in lease_units]
+        missing_units = [
+            unit for unit in units if canonical_unit(unit) not in lease_units
+        ]
         if missing_units:
             for unit in missing_units:
                 formatted_address = f"{address}, units {unit}"
@@ -65,7 +66,7 @@ def find_lease_missing_by_address(unmatched_leases, unmatched_rentrolls):
     lease_units_by_address = {}
     for lease in unmatched_leases:
         address = lease["lease_property_address"].strip().lower()
-        unit = lease["unit_number"].strip().lower()
+        unit = canonical_unit(lease["unit_number"])
 
         if address not in lease_units_by_address:
             lease_units_by_address[address] = set()
@@ -76,16 +77,17 @@ def find_lease_missing_by_address(unmatched_leases, unmatched_rentrolls):
 
     for rentroll in unmatched_rentrolls:
         address = rentroll["property_address"].strip().lower()
-        units_in_rentroll = set(
+        units_in_rentroll = canonical_unit_map(
             unit.strip().lower() for unit in rentroll["unit_numbers"]
         )
 
         if address in lease_units_by_address:
             lease_units = lease_units_by_address[address]
-            missing_units = units_in_rentroll - lease_units
+            missing_units = units_in_rentroll.keys() - lease_units
 
             if missing_units:
-                for unit in missing_units:
+                for unit_key in missing_units:
+                    unit = units_in_rentroll[unit_key]
                     formatted_address = f"{address}, unit {unit}"
                     missing_addresses_with_units.append(formatted_address)
                 missing_counts.append(len(missing_units))
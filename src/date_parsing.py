@@ -0,0 +1,114 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+
+# Formats extract_year accepts, in the order they used to be tried
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%d-%m",
+    "%Y/%m/%d",
+    "%Y/%d/%m",  # Year first
+    "%m-%d-%Y",
+    "%d-%m-%Y",
+    "%m/%d/%Y",
+    "%d/%m/%Y",  # Month/Day/Year
+]
+
+_YEAR_FIRST = re.compile(r"(\d{4})([-/])(\d{1,2})\2(\d{1,2})")
+_YEAR_LAST = re.compile(r"(\d{1,2})([-/])(\d{1,2})\2(\d{4})")
+_YEAR = re.compile(r"\b(\d{4})\b")
+
+
+def _build_date(year, month, day):
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def parse_date(date_string):
+    """
+    Parses a date in any of DATE_FORMATS, sniffing the layout instead of trying each.
+
+    Numeric dates are split once and the month/day order is resolved the same
+    way the format list would: month first, then day first if that is not a
+    valid date. Anything else falls back to trying the formats in order.
+
+    Args:
+        date_string (str): The date to be parsed.
+
+    Returns:
+        datetime: The parsed date, or None if no format matches.
+    """
+    match = _YEAR_FIRST.fullmatch(date_string)
+    if match:
+        year, _, first, second = match.groups()
+        return _build_date(year, first, second) or _build_date(year, second, first)
+
+    match = _YEAR_LAST.fullmatch(date_string)
+    if match:
+        first, _, second, year = match.groups()
+        return _build_date(year, first, second) or _build_date(year, second, first)
+
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_string, date_format)
+        except ValueError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=65536)
+def extract_year(date_string):
+    """Extracts the year from a date string, falling back to the first 4-digit number."""
+    date_object = parse_date(date_string)
+    if date_object:
+        return date_object.year
+
+    year_match = _YEAR.search(date_string)
+    if year_match:
+        return int(year_match.group(1))
+    return None
+
+
+@lru_cache(maxsize=65536)
+def parse_iso_date(date_string):
+    """
+    Memoized datetime.strptime(date_string, "%Y-%m-%d").
+
+    Raises:
+        ValueError: If the string is not a %Y-%m-%d date.
+    """
+    return datetime.strptime(date_string, "%Y-%m-%d")
+
+
+def to_datetime64(date_strings):
+    """
+    Converts a column of %Y-%m-%d strings into a datetime64[D] array in one call.
+
+    Each distinct string is parsed once through the parse_iso_date memo.
+
+    Args:
+        date_strings (list): The dates to be converted.
+
+    Returns:
+        numpy.ndarray: The dates as datetime64[D].
+
+    Raises:
+        ValueError: If any string is not a %Y-%m-%d date.
+    """
+    parsed = {value: parse_iso_date(value) for value in dict.fromkeys(date_strings)}
+    return np.array([parsed[value] for value in date_strings], dtype="datetime64[D]")
+
+
+def extract_years(date_strings):
+    """Vectorized extract_year: returns an int array with -1 where no year was found."""
+    years = {value: extract_year(value) for value in dict.fromkeys(date_strings)}
+    return np.array(
+        [-1 if years[value] is None else years[value] for value in date_strings],
+        dtype=np.int64,
+    )
@@ -0,0 +1,229 @@
+import ast
+import os
+import re
+
+from unit_normalization import canonical_unit_map
+
+
+DOCUMENT_FIELDS = {
+    "lease": {"address": "address", "units": "unit_number"},
+    "rent_roll": {"address": "property_address", "units": "unit_numbers"},
+    "tax": {"address": "full_address", "units": None},
+}
+
+
+UNIT_BRACKETS = {"[": "]", "(": ")", "{": "}"}
+UNIT_QUOTES = "'\""
+
+# Values the prompts use for "not found"; they stand for no unit at all
+MISSING_VALUES = ("N/A", "", None)
+
+# One list element: a quoted string (commas inside are kept) or a bare value
+_UNIT_LIST_TOKEN = re.compile(
+    r"""\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[^,]+)\s*(?:,|$)"""
+)
+
+
+def parse_unit_token(token):
+    """
+    Turns one list element into a unit key: quoted -> str, bare integer -> int.
+
+    Escapes in quoted elements are decoded; an element with a malformed
+    escape is kept as written rather than failing the whole document.
+
+    >>> parse_unit_token("'C:\\\\N'")
+    'C:\\\\N'
+    >>> parse_unit_token("'O\\\\'Brien'")
+    "O'Brien"
+    """
+    token = token.strip()
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in UNIT_QUOTES:
+        if "\\" in token:
+            try:
+                return ast.literal_eval(token)
+            except (ValueError, SyntaxError):
+                return token[1:-1]
+        return token[1:-1]
+    if token.isdigit():
+        return int(token)
+    return token
+
+
+def parse_units(value):
+    """
+    Parses an extracted unit field into a frozenset of unit keys without eval.
+
+    List literals like "['A1', 'A2']" are split into their elements, a bare
+    string like "A1" is read as a single unit, and lists/tuples/sets are used
+    as-is. MISSING_VALUES such as "N/A" hold no unit.
+
+    Args:
+        value: The raw unit_numbers / unit_number value.
+
+    Returns:
+        frozenset: The unit keys, empty if the value holds none.
+    """
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(unit for unit in value if unit not in MISSING_VALUES)
+    if isinstance(value, int):
+        return frozenset([value])
+    if not isinstance(value, str):
+        return frozenset()
+    value = value.strip()
+    if value in MISSING_VALUES:
+        return frozenset()
+    if value[:1] in UNIT_BRACKETS:
+        return frozenset(split_unit_list(value) or ())
+    return frozenset([parse_unit_token(value)])
+
+
+def split_unit_list(value):
+    """
+    Splits a list literal like "['A1', 'A2']" into its units, in order.
+
+    Commas inside quoted elements belong to the element, so
+    "['Unit 1, Bldg A', '2B']" gives ["Unit 1, Bldg A", "2B"]. Elements that
+    are MISSING_VALUES are dropped.
+
+    Args:
+        value (str): The list literal.
+
+    Returns:
+        list: The units, or None if value is not a bracketed list.
+    """
+    value = value.strip()
+    if value[:1] not in UNIT_BRACKETS or value[-1:] != UNIT_BRACKETS[value[0]]:
+        return None
+    units = (
+        parse_unit_token(match.group(1))
+        for match in _UNIT_LIST_TOKEN.finditer(value[1:-1])
+    )
+    return [unit for unit in units if unit not in MISSING_VALUES]
+
+
+def parse_unit_labels(value):
+    """
+    Parses an extracted unit field into canonical unit keys.
+
+    Args:
+        value: The raw unit_numbers / unit_number value.
+
+    Returns:
+        dict: Canonical unit key to the unit as it was written, in sorted
+            order of the written values so reports are stable.
+    """
+    return canonical_unit_map(sorted(parse_units(value), key=str))
+
+
+class Document:
+    """One extracted document, normalized once at ingest."""
+
+    __slots__ = (
+        "doc_id",
+        "kind",
+        "file_name",
+        "key",
+        "data",
+        "address",
+        "unit_labels",
+    )
+
+    def __init__(self, kind, blob_name, data, file_to_id_mapping):
+        self.kind = kind
+        self.file_name = os.path.basename(blob_name)
+        self.key = os.path.splitext(self.file_name)[0]
+        self.doc_id = file_to_id_mapping.get(self.key)
+        self.data = data
+
+        fields = DOCUMENT_FIELDS[kind]
+        values = data if isinstance(data, dict) else {}
+        self.address = values.get(fields["address"], "")
+        self.unit_labels = (
+            parse_unit_labels(values.get(fields["units"], "[]"))
+            if fields["units"]
+            else {}
+        )
+
+    def __repr__(self):
+        return f"Document(kind={self.kind!r}, key={self.key!r}, doc_id={self.doc_id!r})"
+
+
+class DocumentRegistry:
+    def __init__(self, lease_info, rent_roll_info, tax_info, file_to_id_mapping):
+        """
+        Ingests the extracted [{blob_name: data}] lists once.
+
+        Every document is normalized into a Document and indexed by kind, so
+        later stages never re-walk the raw lists or re-derive file names, doc
+        IDs and unit keys.
+
+        Args:
+            lease_info (list): Lease extraction results.
+            rent_roll_info (list): Rent roll extraction results.
+            tax_info (list): Tax return extraction results.
+            file_to_id_mapping (dict): File name without extension to doc ID.
+        """
+        self.file_to_id_mapping = file_to_id_mapping
+        self.documents = []
+        self.by_kind = {kind: [] for kind in DOCUMENT_FIELDS}
+        for kind, extractions in [
+            ("lease", lease_info),
+            ("rent_roll", rent_roll_info),
+            ("tax", tax_info),
+        ]:
+            for item in extractions or []:
+                self.add(kind, item)
+
+    def add(self, kind, item):
+        """
+        Ingests one {blob_name: data} extraction result.
+
+        Args:
+            kind (str): "lease", "rent_roll" or "tax".
+            item (dict): The extraction result.
+
+        Returns:
+            list: The Documents created, one per blob in the item.
+        """
+        documents = []
+        for blob_name, data in item.items():
+            document = Document(kind, blob_name, data, self.file_to_id_mapping)
+            self.documents.append(document)
+            self.by_kind[kind].append(document)
+            documents.append(document)
+        return documents
+
+    @property
+    def leases(self):
+        return self.by_kind["lease"]
+
+    @property
+    def rent_rolls(self):
+        return self.by_kind["rent_roll"]
+
+    @property
+    def taxes(self):
+        return self.by_kind["tax"]
+
+    def rent_entries(self):
+        """Rent roll entries in the shape map_rent_id returns."""
+        return [
+            {"rent_key": doc.file_name, "data": doc.data, "doc_id": doc.doc_id or None}
+            for doc in self.rent_rolls
+        ]
+
+    def tax_entries(self):
+        """Tax entries in the shape map_tax_id returns."""
+        try:
+            return [
+                {
+                    "tax_file": doc.file_name,
+                    "doc_id": doc.doc_id or None,
+                    "calendar_year": doc.data.get("calendar_year"),
+                    "name": doc.data.get("name"),
+                    "full_address": doc.data.get("full_address"),
+                }
+                for doc in self.taxes
+            ]
+        except Exception as e:
+            raise ValueError(f"Error mapping tax data to file IDs: {e}")
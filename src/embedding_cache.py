@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, encode_fn, maxsize=50000, path=None, namespace="default"):
+        """
+        Two-tier cache of unit-normalized embedding vectors.
+
+        Args:
+            encode_fn (callable): Encodes a list of strings into a 2D array.
+            maxsize (int): Maximum number of vectors kept in memory.
+            path (str): Optional SQLite file used as a persistent second tier.
+            namespace (str): Separates vectors of different models in the same file.
+        """
+        self.encode_fn = encode_fn
+        self.maxsize = maxsize
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(namespace TEXT, key TEXT, vector BLOB, PRIMARY KEY (namespace, key))"
+            )
+            self._connection.commit()
+
+    @staticmethod
+    def normalize_key(value):
+        return value.strip().lower()
+
+    def get(self, value):
+        """
+        Returns the unit-normalized embedding of the given string.
+
+        Args:
+            value (str): The component string to be embedded.
+
+        Returns:
+            numpy.ndarray: The float32 embedding vector.
+        """
+        return self.get_many([value])[0]
+
+    def get_many(self, values):
+        """
+        Returns the embeddings of several strings, encoding every miss in one call.
+
+        Args:
+            values (list): The component strings to be embedded.
+
+        Returns:
+            numpy.ndarray: A float32 matrix with one row per input string.
+        """
+        keys = [self.normalize_key(value) for value in values]
+        vectors = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in vectors:
+                    continue
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                else:
+                    vector = self._load(key)
+                    if vector is not None:
+                        self.disk_hits += 1
+                        self._remember(key, vector)
+                    else:
+                        self.misses += 1
+                        missing.append(key)
+                vectors[key] = vector
+
+        if missing:
+            encoded = np.asarray(self.encode_fn(missing), dtype=np.float32)
+            norms = np.linalg.norm(encoded, axis=1, keepdims=True)
+            encoded = np.divide(encoded, norms, out=encoded, where=norms > 0)
+            with self._lock:
+                for key, vector in zip(missing, encoded):
+                    vectors[key] = vector
+                    self._remember(key, vector)
+                self._store(missing, encoded)
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def stats(self):
+        """Returns the hit/miss counters and current in-memory size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._memory),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Drops the in-memory tier and resets the counters. The disk tier is kept."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _load(self, key):
+        if self._connection is None:
+            return None
+        row = self._connection.execute(
+            "SELECT vector FROM embeddings WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def _store(self, keys, vectors):
+        if self._connection is None:
+            return
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (namespace, key, vector) VALUES (?, ?, ?)",
+            [
+                (self.namespace, key, vector.tobytes())
+                for key, vector in zip(keys, vectors)
+            ],
+        )
+        self._connection.commit()
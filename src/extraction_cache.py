@@ -0,0 +1,94 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+class ExtractionCache:
+    def __init__(self, path="extraction_cache.sqlite"):
+        """
+        SQLite cache of LLM extraction results keyed by document content.
+
+        Args:
+            path (str): SQLite file the results are kept in.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS extractions "
+            "(key TEXT PRIMARY KEY, blob_name TEXT, result TEXT)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(content_hash, prompt_version, model_name):
+        """
+        Builds the cache key of one extraction.
+
+        Args:
+            content_hash (str): Digest of the document bytes (GCS md5/crc32c or local).
+            prompt_version (str): Identifies the prompts the result was produced with.
+            model_name (str): The model that produced the result.
+
+        Returns:
+            str: The cache key.
+        """
+        return f"{model_name}:{prompt_version}:{content_hash}"
+
+    @staticmethod
+    def prompt_version(*prompts):
+        """Returns a digest of the prompts, so editing one invalidates old results."""
+        digest = hashlib.sha256()
+        for prompt in prompts:
+            digest.update(prompt.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def content_hash(blob):
+        """
+        Returns a digest of a blob's content.
+
+        Uses the md5 or crc32c GCS already computed when the blob was listed,
+        and only downloads the bytes when neither is available.
+        """
+        if getattr(blob, "md5_hash", None):
+            return f"md5:{blob.md5_hash}"
+        if getattr(blob, "crc32c", None):
+            return f"crc32c:{blob.crc32c}"
+        return f"sha256:{hashlib.sha256(blob.download_as_bytes()).hexdigest()}"
+
+    def get(self, key):
+        """Returns the cached result for key, or None on a miss."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, blob_name, result):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO extractions (key, blob_name, result) "
+                "VALUES (?, ?, ?)",
+                (key, blob_name, json.dumps(result)),
+            )
+            self._connection.commit()
+
+    def stats(self):
+        """Returns the hit/miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from document_registry import MISSING_VALUES, split_unit_list
+
+
+def as_list(value):
+    """Returns the elements of a list-valued field, or None for single values."""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, str):
+        return split_unit_list(value)
+    return None
+
+
+def merge_list_values(values):
+    """Unions list values in first-seen order, in the first list's representation."""
+    merged = []
+    seen = set()
+    for value in values:
+        for element in as_list(value) or []:
+            if element not in seen:
+                seen.add(element)
+                merged.append(element)
+    first = next((value for value in values if as_list(value) is not None), None)
+    return str(merged) if isinstance(first, str) else merged
+
+
+def reconcile_single_values(values):
+    """Picks the most common found value; ties go to the earliest chunk."""
+    found = [value for value in values if value not in MISSING_VALUES]
+    if not found:
+        return values[0]
+    counts = Counter(found)
+    return max(found, key=lambda value: (counts[value], -found.index(value)))
+
+
+def merge_extractions(results):
+    """
+    Merges the extraction results of a document's page-range chunks.
+
+    Fields holding a list (a list or a list literal such as unit_numbers) are
+    unioned; list literals are split like the registry splits them, so commas
+    inside quoted units stay in the unit. Single-valued fields such as
+    property_address and date are reconciled by majority vote over the chunks
+    that found a value. The merge only depends on chunk order, so the same
+    chunks always give the same result.
+
+    Args:
+        results (list): One extracted dict per chunk, in page order.
+
+    Returns:
+        dict: The merged extraction.
+    """
+    results = [result for result in results if isinstance(result, dict)]
+    keys = list(dict.fromkeys(key for result in results for key in result))
+    merged = {}
+    for key in keys:
+        values = [result[key] for result in results if key in result]
+        if any(
+            value not in MISSING_VALUES and as_list(value) is not None
+            for value in values
+        ):
+            merged[key] = merge_list_values(values)
+        else:
+            merged[key] = reconcile_single_values(values)
+    return merged
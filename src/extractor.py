@@ -1,17 +1,98 @@
+import concurrent.futures
+import threading
+
+from google.api_core import exceptions as google_exceptions
 from vertexai.generative_models import GenerationConfig
 from vertexai.preview.generative_models import GenerativeModel, Part
 from google.cloud import storage
-from utility import clean_json_strings
+from extraction_merge import merge_extractions
+from rate_limiting import retry_with_backoff
+from utility import (
+    PDF_ERRORS,
+    clean_json_strings,
+    excel_bytes_to_pdf,
+    extract_pdf_text,
+    pdf_page_count,
+    slice_pdf,
+)
+
+# Errors raised when the model is throttled or briefly unavailable
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+)
 
 
 class Extractor:
-    def __init__(self, bucket_name: str, system_prompt: str):
+    def __init__(
+        self,
+        bucket_name: str,
+        system_prompt: str,
+        workers: int = 1,
+        rate_limiter=None,
+        max_retries: int = 5,
+        extraction_llm=None,
+        bucket=None,
+        cache=None,
+        model_name: str = "gemini-1.5-flash-001",
+        text_mode: bool = False,
+        max_text_pages: int = None,
+        chunk_page_threshold: int = None,
+        chunk_pages: int = None,
+        spreadsheet_parser=None,
+    ):
+        """
+        Extracts structured data from the documents in a GCS folder with Gemini.
+
+        Args:
+            bucket_name (str): The GCS bucket holding the documents.
+            system_prompt (str): System instruction for the extraction model.
+            workers (int): Number of documents extracted concurrently.
+            rate_limiter (TokenBucket): Optional limiter shared by every call,
+                e.g. across the lease, rent roll and tax extractors.
+            max_retries (int): Retries on throttling errors before giving up.
+            extraction_llm: Optional model backend exposing generate_content;
+                defaults to Gemini. Lets a local fake stand in for tests.
+            bucket: Optional bucket exposing name and list_blobs; defaults to
+                the GCS bucket named bucket_name.
+            cache (ExtractionCache): Optional cache of results by content hash,
+                prompt version and model; only misses reach the model.
+            model_name (str): The Gemini model used for extraction.
+            text_mode (bool): Send the text layer of text-native PDFs instead
+                of the PDF itself; scanned PDFs still go by URI.
+            max_text_pages (int): Optional cap on the pages sent in text mode.
+            chunk_page_threshold (int): PDFs with more pages than this are split
+                into page-range chunks that are extracted concurrently and
+                merged with extraction_merge.merge_extractions.
+            chunk_pages (int): Pages per chunk; defaults to the threshold.
+            spreadsheet_parser (callable): Optional local parser for .xlsx blobs,
+                taking the workbook bytes and returning the extracted dict, or
+                None to fall back to the LLM on the workbook converted to PDF.
+        """
         self.generation_config = GenerationConfig(temperature=0, top_p=0.2)
-        self.extraction_llm = GenerativeModel(
-            model_name="gemini-1.5-flash-001", system_instruction=[system_prompt]
+        self.system_prompt = system_prompt
+        self.model_name = model_name
+        self.extraction_llm = extraction_llm or GenerativeModel(
+            model_name=model_name, system_instruction=[system_prompt]
         )
-        self.client = storage.Client()
-        self.bucket = self.client.get_bucket(bucket_name)
+        self.workers = workers
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.cache = cache
+        self.text_mode = text_mode
+        self.max_text_pages = max_text_pages
+        self.chunk_page_threshold = chunk_page_threshold
+        self.chunk_pages = chunk_pages or chunk_page_threshold
+        self.spreadsheet_parser = spreadsheet_parser
+        # Chunk pools run inside the per-blob pool; this keeps the model calls
+        # in flight at `workers` instead of up to workers**2
+        self._model_calls = threading.BoundedSemaphore(max(workers, 1))
+        if bucket is None:
+            self.client = storage.Client()
+            bucket = self.client.get_bucket(bucket_name)
+        self.bucket = bucket
 
     def extract(
         self,
@@ -20,19 +101,179 @@ class Extractor:
         ext=".pdf",
         mime_type="application/pdf",
     ):
-        response_list = []
-        blobs = self.bucket.list_blobs(prefix=gcs_folder)
-        for blob in blobs:
-            print(f"Extractor processing for : {blob}")
-            if blob.name.endswith(".csv"):
-                mime_type = "text/csv"
-            pdf_uri = f"gs://{self.bucket.name}/{blob.name}"
-            pdf_file = Part.from_uri(uri=pdf_uri, mime_type=mime_type)
-            contents = [pdf_file, extraction_prompt]
-            response = self.extraction_llm.generate_content(
-                contents, generation_config=self.generation_config
+        """
+        Extracts every blob under gcs_folder.
+
+        With workers > 1 blobs are extracted on a thread pool; results are
+        still returned in listing order, so runs are deterministic.
+        """
+        blobs = list(self.bucket.list_blobs(prefix=gcs_folder))
+
+        def extract_one(blob):
+            return self.extract_blob(blob, extraction_prompt, mime_type)
+
+        if self.workers <= 1:
+            return [extract_one(blob) for blob in blobs]
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers
+        ) as executor:
+            return list(executor.map(extract_one, blobs))
+
+    def stream(
+        self,
+        gcs_folder: str,
+        extraction_prompt: str,
+        ext=".pdf",
+        mime_type="application/pdf",
+    ):
+        """
+        Yields each {blob_name: result} as soon as its extraction finishes.
+
+        Unlike extract, results come in completion order, so consumers can
+        start on the first documents while the slow ones are still running.
+        """
+        blobs = list(self.bucket.list_blobs(prefix=gcs_folder))
+        if self.workers <= 1:
+            for blob in blobs:
+                yield self.extract_blob(blob, extraction_prompt, mime_type)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers
+        ) as executor:
+            futures = [
+                executor.submit(self.extract_blob, blob, extraction_prompt, mime_type)
+                for blob in blobs
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+
+    def extract_blob(self, blob, extraction_prompt: str, mime_type="application/pdf"):
+        if blob.name.endswith(".csv"):
+            mime_type = "text/csv"
+
+        cache_key = None
+        if self.cache is not None:
+            # Text-mode results can differ from PDF ones, so they are cached apart
+            mode = (f"text:{self.max_text_pages}",) if self.text_mode else ()
+            if self.chunk_page_threshold:
+                mode += (f"chunks:{self.chunk_page_threshold}/{self.chunk_pages}",)
+            cache_key = self.cache.make_key(
+                self.cache.content_hash(blob),
+                self.cache.prompt_version(self.system_prompt, extraction_prompt, *mode),
+                self.model_name,
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Cached {blob.name}")
+                return {blob.name: cached}
+
+        print(f"Extractor processing for : {blob}")
+        pdf_bytes = None
+        if blob.name.endswith(".xlsx"):
+            excel_bytes = blob.download_as_bytes()
+            if self.spreadsheet_parser is not None:
+                parsed = self.spreadsheet_parser(excel_bytes)
+                if parsed is not None:
+                    print(f"Parsed {blob.name} locally")
+                    return {blob.name: parsed}
+            # Gemini does not read workbooks, so the fallback goes through PDF
+            mime_type = "application/pdf"
+            pdf_bytes = excel_bytes_to_pdf(excel_bytes)
+        elif mime_type == "application/pdf" and (
+            self.text_mode or self.chunk_page_threshold
+        ):
+            pdf_bytes = blob.download_as_bytes()
+
+        page_ranges = self.page_ranges(pdf_bytes)
+        if page_ranges:
+            response = self.extract_chunks(
+                blob, pdf_bytes, page_ranges, extraction_prompt, mime_type
+            )
+        else:
+            part = self.document_part(blob, mime_type, pdf_bytes)
+            response = clean_json_strings(
+                self.generate([part, extraction_prompt]).text
             )
-            response = clean_json_strings(response.text)
-            response_list.append({blob.name: response})
-            print(f"Processed {blob.name}")
-        return response_list
+        if cache_key is not None:
+            self.cache.put(cache_key, blob.name, response)
+        print(f"Processed {blob.name}")
+        return {blob.name: response}
+
+    def page_ranges(self, pdf_bytes):
+        """Returns the page-range chunks of a PDF, or [] if it is not split."""
+        if pdf_bytes is None or not self.chunk_page_threshold:
+            return []
+        try:
+            page_count = pdf_page_count(pdf_bytes)
+        except PDF_ERRORS as e:
+            # An unreadable PDF is sent whole, by URI
+            print(f"Could not count the pages of a PDF, not chunking it: {e}")
+            return []
+        if page_count <= self.chunk_page_threshold:
+            return []
+        return [
+            range(start, min(start + self.chunk_pages, page_count))
+            for start in range(0, page_count, self.chunk_pages)
+        ]
+
+    def extract_chunks(
+        self, blob, pdf_bytes, page_ranges, extraction_prompt, mime_type
+    ):
+        """Extracts each page range concurrently and merges them in page order."""
+
+        def extract_chunk(pages):
+            print(f"Extracting pages {pages.start + 1}-{pages.stop} of {blob.name}")
+            part = self.document_part(blob, mime_type, pdf_bytes, pages)
+            return clean_json_strings(self.generate([part, extraction_prompt]).text)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(page_ranges), max(self.workers, 1))
+        ) as executor:
+            return merge_extractions(list(executor.map(extract_chunk, page_ranges)))
+
+    def document_part(
+        self, blob, mime_type="application/pdf", pdf_bytes=None, pages=None
+    ):
+        """
+        Builds the content part that carries the document to the model.
+
+        In text mode a text-native PDF is sent as its text layer, a much
+        smaller payload than the PDF. A page-range chunk that is not sent as
+        text is sent as a sliced PDF, and a workbook as its converted PDF.
+        Anything else, including a PDF fitz cannot read, is passed by GCS URI.
+        """
+        if self.text_mode and pdf_bytes is not None:
+            try:
+                text = extract_pdf_text(
+                    pdf_bytes, max_pages=self.max_text_pages, pages=pages
+                )
+            except PDF_ERRORS as e:
+                # Empty placeholders and corrupt files keep the URI path
+                print(f"Could not read the text layer of {blob.name}: {e}")
+                text = None
+            if text:
+                print(f"Using text layer for {blob.name}")
+                return Part.from_text(text)
+
+        if pages is not None:
+            return Part.from_data(data=slice_pdf(pdf_bytes, pages), mime_type=mime_type)
+        if blob.name.endswith(".xlsx"):
+            return Part.from_data(data=pdf_bytes, mime_type=mime_type)
+
+        pdf_uri = f"gs://{self.bucket.name}/{blob.name}"
+        return Part.from_uri(uri=pdf_uri, mime_type=mime_type)
+
+    def generate(self, contents):
+        """Calls the model under the rate limiter, backing off on throttling."""
+
+        def call():
+            with self._model_calls:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                return self.extraction_llm.generate_content(
+                    contents, generation_config=self.generation_config
+                )
+
+        return retry_with_backoff(call, RETRYABLE_ERRORS, max_retries=self.max_retries)
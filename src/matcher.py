@@ -2,105 +2,234 @@ import os
 import uuid
 import json
 import ast
+import time
+import threading
+import concurrent.futures
 
 from datetime import datetime
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
 from matcher_utility import *
 from address_validation import *
 from utility import normalize_string, normalize_address
 from count import *
 from dateutil import parser
+from model_registry import get_model
+from document_registry import DocumentRegistry, parse_unit_labels
 
 
 class Matcher:
-    def __init__(self, lease_info, rent_roll_info, tax_info, id_mapped):
+    def __init__(
+        self,
+        lease_info,
+        rent_roll_info,
+        tax_info,
+        id_mapped,
+        bucket_method="blocking",
+        concurrent_validators=False,
+        validator_workers=1,
+        shard_size=50,
+        summarize_rent_to_tax=False,
+    ):
         self.lease_info = lease_info or []
         self.rent_roll_info = rent_roll_info or []
         self.tax_info = tax_info or []
         self.id_map = {id: filename for id, filename in id_mapped}
+        self.bucket_method = bucket_method
+        self.concurrent_validators = concurrent_validators
+        self.validator_workers = validator_workers
+        self.shard_size = shard_size
+        self.summarize_rent_to_tax = summarize_rent_to_tax
+
+        # Stage graph: each stage runs lazily on first use and is reused by
+        # every later consumer. Timings include dependencies computed on demand.
+        self.stages = {
+            "ingest": self._ingest_stage,
+            "tax_id_mapping": self._tax_id_mapping_stage,
+            "rent_id_mapping": self._rent_id_mapping_stage,
+            "bucketing": self._bucketing_stage,
+            "lease_to_rent": self._lease_to_rent_stage,
+            "validators": self.time_period_validator,
+            "report": self._report_stage,
+        }
+        self.stage_results = {}
+        self.stage_timings = {}
+        self.stage_locks = {name: threading.Lock() for name in self.stages}
         self.file_to_id_mapping = {
             os.path.splitext(os.path.basename(filename))[0]: file_id
             for file_id, filename in self.id_map.items()
         }
 
-        self.transformer = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+    def stage(self, name):
+        """Returns the result of a pipeline stage, computing it once."""
+        with self.stage_locks[name]:
+            if name not in self.stage_results:
+                start = time.perf_counter()
+                self.stage_results[name] = self.stages[name]()
+                self.stage_timings[name] = time.perf_counter() - start
+            return self.stage_results[name]
+
+    def get_stage_timings(self):
+        """Returns the wall-clock seconds spent computing each stage so far."""
+        return dict(self.stage_timings)
+
+    def _ingest_stage(self):
+        return DocumentRegistry(
+            self.lease_info, self.rent_roll_info, self.tax_info, self.file_to_id_mapping
+        )
+
+    def _tax_id_mapping_stage(self):
+        # Ingests the tax files alone, so tax validation never depends on the
+        # lease and rent roll documents
+        if not self.tax_info:
+            return {}
+        return DocumentRegistry(
+            [], [], self.tax_info, self.file_to_id_mapping
+        ).tax_entries()
+
+    def _rent_id_mapping_stage(self):
+        return self.stage("ingest").rent_entries()
+
+    def _bucketing_stage(self):
+        registry = self.stage("ingest")
+        return self.bucket_documents(
+            registry.rent_rolls, registry.leases, method=self.bucket_method
+        )
+
+    def _lease_to_rent_stage(self):
+        return validate_lease_to_rent_sharded(
+            self.stage("bucketing"),
+            workers=self.validator_workers,
+            shard_size=self.shard_size,
+        )
+
+    def _report_stage(self):
+        address_bucket = self.stage("bucketing")
+        return {
+            "mapping_result": transform_address_bucket(address_bucket),
+            "missing_report_on_property": self.missing_files(address_bucket),
+        }
+
+    @property
+    def transformer(self):
+        return get_model()
 
     @classmethod
-    def address_bucket_creation(cls, rent_json, lease_json, file_to_id_mapping):
+    def address_bucket_creation(
+        cls, rent_json, lease_json, file_to_id_mapping, method="blocking"
+    ):
+        """Groups rent rolls and leases by property address.
+
+        method="blocking" matches each lease against same-(number, ZIP)
+        buckets one pair at a time. method="vectorized" scores every lease
+        against every bucket with matrix products and takes the best match.
+        """
+        registry = DocumentRegistry(lease_json, rent_json, [], file_to_id_mapping)
+        return cls.bucket_documents(registry.rent_rolls, registry.leases, method)
+
+    @classmethod
+    def bucket_documents(cls, rent_documents, lease_documents, method="blocking"):
+        """Groups ingested rent roll and lease Documents by property address."""
         result = defaultdict(lambda: {"rent_roll": [], "leases": []})
+        block_index = AddressBlockIndex()
 
         # Process rent roll data
-        for rent_item in rent_json:
-            for rent_key, rent_value in rent_item.items():
-                rent_key = os.path.splitext(os.path.basename(rent_key))[0]
-                rent_address = rent_value.get("property_address", "")
-                rent_id = file_to_id_mapping.get(rent_key, None)
-
-                result[rent_address]["rent_roll"].append(
-                    {"rent_key": rent_key, "data": rent_value, "doc_id": rent_id}
-                )
+        for rent_doc in rent_documents:
+            result[rent_doc.address]["rent_roll"].append(cls.rent_entry(rent_doc))
+            block_index.add(rent_doc.address)
+
+        if method == "vectorized":
+            assignments = assign_addresses(
+                [lease_doc.address for lease_doc in lease_documents], list(result)
+            )
 
         # Process lease data
-        for lease_item in lease_json:
-            for lease_key, lease_value in lease_item.items():
-                lease_key = os.path.splitext(os.path.basename(lease_key))[0]
-                lease_address = lease_value.get("address", "")
-                lease_id = file_to_id_mapping.get(lease_key, None)
-
-                matched_address = next(
-                    (
-                        rent_address
-                        for rent_address in result
-                        if compare_addresses(lease_address, rent_address)
-                    ),
-                    None,
-                )
+        for lease_doc in lease_documents:
+            lease_address = lease_doc.address
+            lease_entry = cls.lease_entry(lease_doc)
 
-                if matched_address:
-                    result[matched_address]["leases"].append(
-                        {
-                            "lease_key": lease_key,
-                            "data": lease_value,
-                            "doc_id": lease_id,
-                        }
-                    )
-                else:
-                    result[lease_address]["leases"].append(
-                        {
-                            "lease_key": lease_key,
-                            "data": lease_value,
-                            "doc_id": lease_id,
-                        }
-                    )
+            if method == "vectorized":
+                result[assignments[lease_address]]["leases"].append(lease_entry)
+                continue
+
+            matched_address = cls.match_bucket(lease_address, block_index)
+            if matched_address:
+                result[matched_address]["leases"].append(lease_entry)
+            else:
+                result[lease_address]["leases"].append(lease_entry)
+                block_index.add(lease_address)
 
         return dict(result)
 
+    @staticmethod
+    def rent_entry(rent_doc):
+        return {
+            "rent_key": rent_doc.key,
+            "data": rent_doc.data,
+            "doc_id": rent_doc.doc_id,
+            "unit_labels": rent_doc.unit_labels,
+        }
+
+    @staticmethod
+    def lease_entry(lease_doc):
+        return {
+            "lease_key": lease_doc.key,
+            "data": lease_doc.data,
+            "doc_id": lease_doc.doc_id,
+            "unit_labels": lease_doc.unit_labels,
+        }
+
+    @staticmethod
+    def match_bucket(lease_address, block_index):
+        """Returns the first indexed bucket address the lease matches, or None."""
+        return next(
+            (
+                rent_address
+                for rent_address in block_index.candidates(lease_address)
+                if compare_addresses(lease_address, rent_address)
+            ),
+            None,
+        )
+
     @classmethod
     def missing_files(cls, address_bucket):
         missing_dict = {}
 
         def extract_units(doc_list, key):
-            units = set()
+            # Canonical unit key -> the unit as first written in this bucket
+            labels = {}
+            for doc in doc_list:
+                for unit_key, unit in cls.document_units(doc, key).items():
+                    labels.setdefault(unit_key, unit)
+            return labels
+
+        def doc_map_for(doc_list, key, missing_units):
             doc_map = defaultdict(list)
             for doc in doc_list:
-                doc_units = cls.safe_eval(doc["data"].get(key, "[]"))
-                for unit in doc_units:
-                    units.add(unit)
-                    doc_map[unit].append(doc["doc_id"])
-            return units, doc_map
+                for unit_key in cls.document_units(doc, key).keys() & missing_units:
+                    doc_map[unit_key].append(doc["doc_id"])
+            return doc_map
 
         for address, data in address_bucket.items():
             issues = []
-            rent_units, rent_map = extract_units(data["rent_roll"], "unit_numbers")
-            lease_units, lease_map = extract_units(data["leases"], "unit_number")
+            rent_units = extract_units(data["rent_roll"], "unit_numbers")
+            lease_units = extract_units(data["leases"], "unit_number")
 
-            for unit in rent_units - lease_units:
-                issues.append(cls.generate_issue("missing_lease", rent_map[unit], unit))
+            missing_leases = rent_units.keys() - lease_units.keys()
+            rent_map = doc_map_for(data["rent_roll"], "unit_numbers", missing_leases)
+            for unit_key in missing_leases:
+                issues.append(
+                    cls.generate_issue(
+                        "missing_lease", rent_map[unit_key], rent_units[unit_key]
+                    )
+                )
 
-            for unit in lease_units - rent_units:
+            missing_rentrolls = lease_units.keys() - rent_units.keys()
+            lease_map = doc_map_for(data["leases"], "unit_number", missing_rentrolls)
+            for unit_key in missing_rentrolls:
                 issues.append(
-                    cls.generate_issue("missing_rentroll", lease_map[unit], unit)
+                    cls.generate_issue(
+                        "missing_rentroll", lease_map[unit_key], lease_units[unit_key]
+                    )
                 )
 
             if issues:
@@ -118,6 +247,14 @@ class Matcher:
             "message": f"{issue_subtag.replace('_', ' ').title()} identified for Unit {unit}.",
         }
 
+    @staticmethod
+    def document_units(doc, key):
+        """Returns a bucket entry's canonical unit keys mapped to their labels."""
+        units = doc.get("unit_labels")
+        if units is None:
+            units = parse_unit_labels(doc["data"].get(key, "[]"))
+        return units
+
     @staticmethod
     def safe_eval(value):
         try:
@@ -126,61 +263,56 @@ class Matcher:
             return []
 
     def time_period_validator(self):
-        result = {}
+        validators = {
+            "tax_to_current_year": self.validate_tax_to_current_year,
+            "lease_to_rent": self.validate_lease_to_rent,
+            "rent_to_tax": self.validate_rent_to_tax,
+        }
+        if not self.concurrent_validators:
+            return {name: validator() for name, validator in validators.items()}
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(validators)
+        ) as executor:
+            futures = {
+                name: executor.submit(validator)
+                for name, validator in validators.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
 
-        # For tax to current year validation
+    def validate_tax_to_current_year(self):
         try:
-            mapped_tax_data = (
-                map_tax_id(self.tax_info, self.file_to_id_mapping)
-                if self.tax_info
-                else {}
-            )
+            mapped_tax_data = self.stage("tax_id_mapping")
             if not mapped_tax_data:
-                result["tax_to_current_year"] = {"error": "Tax Document is missing."}
-            else:
-                result["tax_to_current_year"] = validate_tax_data_new(
-                    mapped_tax_data,
-                    {datetime.now().year - 2, datetime.now().year - 1},
-                    set(),
-                    {},
-                )
+                return {"error": "Tax Document is missing."}
+            return validate_tax_data_new(
+                mapped_tax_data,
+                {datetime.now().year - 2, datetime.now().year - 1},
+                set(),
+                {},
+            )
         except Exception as e:
-            result["tax_to_current_year"] = {
-                "error": f"An error occurred in tax validation: {str(e)}"
-            }
+            return {"error": f"An error occurred in tax validation: {str(e)}"}
 
-        # For lease to rent validation
+    def validate_lease_to_rent(self):
         try:
             if not (self.lease_info and self.rent_roll_info):
-                result["lease_to_rent"] = {
-                    "error": "Lease or Rent Roll Document is missing."
-                }
-            else:
-                result["lease_to_rent"] = validate_lease_to_rent_new(
-                    self.address_bucket_creation(
-                        self.rent_roll_info, self.lease_info, self.file_to_id_mapping
-                    )
-                )
+                return {"error": "Lease or Rent Roll Document is missing."}
+            return self.stage("lease_to_rent")
         except Exception as e:
-            result["lease_to_rent"] = {
-                "error": f"An error occurred in lease-to-rent validation: {str(e)}"
-            }
+            return {"error": f"An error occurred in lease-to-rent validation: {str(e)}"}
 
-        # For rent to tax validation
+    def validate_rent_to_tax(self):
         try:
             if not (self.rent_roll_info and self.tax_info):
-                result["rent_to_tax"] = {"error": "Rentroll or Tax data is missing."}
-            else:
-                result["rent_to_tax"] = validate_rent_to_tax_new(
-                    map_rent_id(self.rent_roll_info, self.file_to_id_mapping),
-                    mapped_tax_data,
-                )
+                return {"error": "Rentroll or Tax data is missing."}
+            return validate_rent_to_tax_new(
+                self.stage("rent_id_mapping"),
+                self.stage("tax_id_mapping"),
+                summarize=self.summarize_rent_to_tax,
+            )
         except Exception as e:
-            result["rent_to_tax"] = {
-                "error": f"An error occurred in rent-to-tax validation: {str(e)}"
-            }
-
-        return result
+            return {"error": f"An error occurred in rent-to-tax validation: {str(e)}"}
 
     def check_missing_files(self, tags_list):
         """Check for missing files based on a predefined document list."""
@@ -243,22 +375,195 @@ class Matcher:
             }
 
         # Step 1: Process Address Bucketing
-        address_bucket = self.address_bucket_creation(
-            self.rent_roll_info, self.lease_info, self.file_to_id_mapping
-        )
+        self.stage("bucketing")
 
         # Step 2: Perform Validations & Reports
-        mapping_result = transform_address_bucket(address_bucket)
-        missing_report = self.missing_files(address_bucket)
-        validation_report = self.time_period_validator()
+        report = self.stage("report")
+        validation_report = self.stage("validators")
         missing_files_report = self.check_missing_files(tags_list)
 
         # Step 3: Handle Missing Tax Year Separately
         file_issues = self.handle_missing_tax_year(validation_report)
 
         return {
-            "mapping_result": mapping_result,
-            "missing_report_on_property": missing_report,
+            "mapping_result": report["mapping_result"],
+            "missing_report_on_property": report["missing_report_on_property"],
             "document_version_validator": validation_report,
             "missing_files_on_deal": file_issues + missing_files_report,
         }
+
+
+class IncrementalMatcher:
+    def __init__(self, id_mapped, validator_workers=4, **matcher_options):
+        """
+        Matcher entry point that consumes extraction results as they stream in.
+
+        Rent rolls open buckets on arrival and leases are assigned as soon as
+        they arrive, with the same blocking rules as Matcher.bucket_documents.
+        A lease that matches no bucket yet is held back and retried whenever a
+        new rent roll opens one; leftovers open their own buckets at finish.
+        Lease-to-rent validation of a bucket is started on a thread pool each
+        time the bucket changes, so by the end of the stream only buckets that
+        changed after their last validation need to be revalidated.
+
+        Args:
+            id_mapped (list): (doc_id, filename) pairs, as Matcher takes them.
+            validator_workers (int): Threads validating buckets in the background.
+            **matcher_options: Passed to the Matcher that builds the final report.
+                Buckets are always formed by blocking, so bucket_method may
+                only be "blocking".
+
+        Raises:
+            ValueError: If another bucket_method is requested.
+        """
+        bucket_method = matcher_options.get("bucket_method", "blocking")
+        if bucket_method != "blocking":
+            raise ValueError(
+                "IncrementalMatcher only supports blocking bucketing, "
+                f"not {bucket_method!r}"
+            )
+        self.id_mapped = id_mapped
+        self.matcher_options = matcher_options
+        self.lease_info = []
+        self.rent_roll_info = []
+        self.tax_info = []
+        self.registry = DocumentRegistry(
+            [],
+            [],
+            [],
+            {
+                os.path.splitext(os.path.basename(filename))[0]: file_id
+                for file_id, filename in id_mapped
+            },
+        )
+        self.buckets = defaultdict(lambda: {"rent_roll": [], "leases": []})
+        self.block_index = AddressBlockIndex()
+        self.pending_leases = []
+        self.versions = defaultdict(int)
+        self.validations = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=validator_workers
+        )
+
+    def add(self, kind, item):
+        """
+        Ingests one {blob_name: data} extraction result.
+
+        Args:
+            kind (str): "lease", "rent_roll" or "tax".
+            item (dict): The extraction result.
+        """
+        extractions = {
+            "lease": self.lease_info,
+            "rent_roll": self.rent_roll_info,
+            "tax": self.tax_info,
+        }
+        extractions[kind].append(item)
+        for document in self.registry.add(kind, item):
+            if kind == "rent_roll":
+                self._add_rent_roll(document)
+            elif kind == "lease":
+                self._add_lease(document)
+
+    def consume(self, stream, tags_list):
+        """Ingests (kind, item) pairs from stream, then returns the match report."""
+        try:
+            for kind, item in stream:
+                self.add(kind, item)
+            return self.finish(tags_list)
+        finally:
+            # Also reached when the stream or add() raises before finish
+            self.executor.shutdown(cancel_futures=True)
+
+    def finish(self, tags_list):
+        """
+        Closes the stream and returns the same report as Matcher.match.
+
+        Args:
+            tags_list (list): Document tags present on the deal.
+
+        Returns:
+            dict: The match report.
+        """
+        for lease_doc, lease_entry in self.pending_leases:
+            matched_address = Matcher.match_bucket(lease_doc.address, self.block_index)
+            if not matched_address:
+                matched_address = lease_doc.address
+                self.block_index.add(matched_address)
+            self._assign(matched_address, "leases", lease_entry)
+        self.pending_leases = []
+
+        address_bucket = dict(self.buckets)
+        matcher = Matcher(
+            self.lease_info,
+            self.rent_roll_info,
+            self.tax_info,
+            self.id_mapped,
+            **self.matcher_options,
+        )
+        matcher.stage_results["ingest"] = self.registry
+        matcher.stage_results["bucketing"] = address_bucket
+        matcher.stages["lease_to_rent"] = self._collect_validations
+        try:
+            return matcher.match(tags_list)
+        finally:
+            self.executor.shutdown()
+
+    def _add_rent_roll(self, rent_doc):
+        address = rent_doc.address
+        self._assign(address, "rent_roll", Matcher.rent_entry(rent_doc))
+        if address in self.block_index.order:
+            return
+        self.block_index.add(address)
+
+        # Leases that arrived before this rent roll may belong to its bucket
+        key = address_block_key(address)
+        still_pending = []
+        for lease_doc, lease_entry in self.pending_leases:
+            lease_key = address_block_key(lease_doc.address)
+            if (
+                key is None or lease_key is None or key == lease_key
+            ) and compare_addresses(lease_doc.address, address):
+                self._assign(address, "leases", lease_entry)
+            else:
+                still_pending.append((lease_doc, lease_entry))
+        self.pending_leases = still_pending
+
+    def _add_lease(self, lease_doc):
+        lease_entry = Matcher.lease_entry(lease_doc)
+        matched_address = Matcher.match_bucket(lease_doc.address, self.block_index)
+        if matched_address:
+            self._assign(matched_address, "leases", lease_entry)
+        else:
+            self.pending_leases.append((lease_doc, lease_entry))
+
+    def _assign(self, address, side, entry):
+        self.buckets[address][side].append(entry)
+        self.versions[address] += 1
+        validation = self.validations.get(address)
+        if validation is None or validation[1].done():
+            self._submit_validation(address)
+
+    def _submit_validation(self, address):
+        bucket = self.buckets[address]
+        snapshot = {
+            address: {
+                "rent_roll": list(bucket["rent_roll"]),
+                "leases": list(bucket["leases"]),
+            }
+        }
+        self.validations[address] = (
+            self.versions[address],
+            self.executor.submit(validate_lease_to_rent_new, snapshot),
+        )
+
+    def _collect_validations(self):
+        """Waits for bucket validations, revalidating buckets that changed since."""
+        report = {}
+        for address in self.buckets:
+            validation = self.validations.get(address)
+            if validation is None or validation[0] != self.versions[address]:
+                self._submit_validation(address)
+        for address in self.buckets:
+            report.update(self.validations[address][1].result())
+        return report
@@ -84,16 +84,32 @@
 #     matcher_extraction_pipeline()
 import vertexai
 import concurrent.futures
+import queue
 
 from extractor import Extractor
+from extraction_cache import ExtractionCache
 import lease_prompt as lease_prompt
 import rent_roll_prompt as rental_prompt
 import tax_prompt as tax_prompt
 from gcs_uitility import list_files_in_gcs_folder
+from matcher import IncrementalMatcher
+from rate_limiting import TokenBucket
+from rent_roll_parser import parse_rent_roll_workbook
 from utility import *
 
+# Documents extracted concurrently per folder
+EXTRACTION_WORKERS = 8
+# Gemini request quota shared by the lease, rent roll and tax extractors
+REQUESTS_PER_MINUTE = 200
+# Extraction results of unchanged documents are reused from this file
+EXTRACTION_CACHE_PATH = "extraction_cache.sqlite"
+# Send the text layer of text-native PDFs instead of the whole file
+TEXT_MODE = True
+# Rent rolls longer than this many pages are extracted in page-range chunks
+RENT_ROLL_CHUNK_PAGES = 10
 
-def extract_lease_info(bucket_name, gcs_folder):
+
+def extract_lease_info(bucket_name, gcs_folder, rate_limiter=None, cache=None):
     lease_files = list_files_in_gcs_folder(bucket_name, gcs_folder)
     if not lease_files:
         print(f"NO LEASE FILES FOUND IN GCS: {gcs_folder}")
@@ -101,14 +117,19 @@ def extract_lease_info(bucket_name, gcs_folder):
 
     print(f"LEASE FILES FOUND IN GCS: {gcs_folder}\n\nEXTRACTING LEASE INFO...")
     lease_extractor = Extractor(
-        bucket_name=bucket_name, system_prompt=lease_prompt.SYSTEM_PROMPT
+        bucket_name=bucket_name,
+        system_prompt=lease_prompt.SYSTEM_PROMPT,
+        workers=EXTRACTION_WORKERS,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        text_mode=TEXT_MODE,
     )
     return lease_extractor.extract(
         gcs_folder=gcs_folder, extraction_prompt=lease_prompt.EXTRACTION_PROMPT
     )
 
 
-def extract_rentroll_info(bucket_name, gcs_folder):
+def extract_rentroll_info(bucket_name, gcs_folder, rate_limiter=None, cache=None):
     rentroll_files = list_files_in_gcs_folder(bucket_name, gcs_folder)
     if not rentroll_files:
         print(f"NO RENTROLL FILES FOUND IN GCS: {gcs_folder}")
@@ -116,14 +137,21 @@ def extract_rentroll_info(bucket_name, gcs_folder):
 
     print(f"RENTROLL FILES FOUND IN GCS: {gcs_folder}\n\nEXTRACTING RENTROLL INFO...")
     rentroll_extractor = Extractor(
-        bucket_name=bucket_name, system_prompt=rental_prompt.SYSTEM_PROMPT
+        bucket_name=bucket_name,
+        system_prompt=rental_prompt.SYSTEM_PROMPT,
+        workers=EXTRACTION_WORKERS,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        text_mode=TEXT_MODE,
+        chunk_page_threshold=RENT_ROLL_CHUNK_PAGES,
+        spreadsheet_parser=parse_rent_roll_workbook,
     )
     return rentroll_extractor.extract(
         gcs_folder=gcs_folder, extraction_prompt=rental_prompt.EXTRACTION_PROMPT
     )
 
 
-def extract_tax_info(bucket_name, gcs_folder):
+def extract_tax_info(bucket_name, gcs_folder, rate_limiter=None, cache=None):
     tax_files = list_files_in_gcs_folder(bucket_name, gcs_folder)
     if not tax_files:
         print(f"NO TAX FILES FOUND IN GCS: {gcs_folder}")
@@ -131,7 +159,12 @@ def extract_tax_info(bucket_name, gcs_folder):
 
     print(f"TAX FILES FOUND IN GCS: {gcs_folder}\n\nEXTRACTING TAX INFO...")
     tax_extractor = Extractor(
-        bucket_name=bucket_name, system_prompt=tax_prompt.SYSTEM_PROMPT
+        bucket_name=bucket_name,
+        system_prompt=tax_prompt.SYSTEM_PROMPT,
+        workers=EXTRACTION_WORKERS,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        text_mode=TEXT_MODE,
     )
     return tax_extractor.extract(
         gcs_folder=gcs_folder, extraction_prompt=tax_prompt.EXTRACTION_PROMPT
@@ -145,23 +178,114 @@ def matcher_extraction_pipeline():
     GCS_TAX_FOLDER = "tax_returns/"
 
     vertexai.init(project="sandbox-230010", location="us-central1")
+    rate_limiter = TokenBucket(REQUESTS_PER_MINUTE)
+    cache = ExtractionCache(EXTRACTION_CACHE_PATH)
 
     with concurrent.futures.ThreadPoolExecutor() as executor:
         future_lease = executor.submit(
-            extract_lease_info, BUCKET_NAME, GCS_LEASE_FOLDER
+            extract_lease_info, BUCKET_NAME, GCS_LEASE_FOLDER, rate_limiter, cache
         )
         future_rentroll = executor.submit(
-            extract_rentroll_info, BUCKET_NAME, GCS_RENTROLL_FOLDER
+            extract_rentroll_info,
+            BUCKET_NAME,
+            GCS_RENTROLL_FOLDER,
+            rate_limiter,
+            cache,
+        )
+        future_tax = executor.submit(
+            extract_tax_info, BUCKET_NAME, GCS_TAX_FOLDER, rate_limiter, cache
         )
-        future_tax = executor.submit(extract_tax_info, BUCKET_NAME, GCS_TAX_FOLDER)
 
         lease_info = future_lease.result()
         rentroll_info = future_rentroll.result()
         tax_info = future_tax.result()
 
+    print(f"EXTRACTION CACHE: {cache.stats()}")
+    cache.close()
+
     print("\n\nSAVING DATA TO JSON FILES...")
     return lease_info, rentroll_info, tax_info
 
 
+def stream_matcher_extractions(bucket_name, folders, rate_limiter=None, cache=None):
+    """
+    Extracts the lease, rent roll and tax folders concurrently and yields
+    (kind, {blob_name: result}) pairs as soon as each document is parsed.
+
+    Args:
+        bucket_name (str): The GCS bucket holding the documents.
+        folders (dict): "lease", "rent_roll" and/or "tax" mapped to GCS folders.
+        rate_limiter (TokenBucket): Limiter shared by the three extractors.
+        cache (ExtractionCache): Extraction cache shared by the three extractors.
+    """
+    prompts = {"lease": lease_prompt, "rent_roll": rental_prompt, "tax": tax_prompt}
+    results = queue.Queue()
+    done = object()
+
+    def produce(kind, gcs_folder):
+        try:
+            if not list_files_in_gcs_folder(bucket_name, gcs_folder):
+                print(f"NO {kind.upper()} FILES FOUND IN GCS: {gcs_folder}")
+                return
+            extractor = Extractor(
+                bucket_name=bucket_name,
+                system_prompt=prompts[kind].SYSTEM_PROMPT,
+                workers=EXTRACTION_WORKERS,
+                rate_limiter=rate_limiter,
+                cache=cache,
+                text_mode=TEXT_MODE,
+                chunk_page_threshold=(
+                    RENT_ROLL_CHUNK_PAGES if kind == "rent_roll" else None
+                ),
+                spreadsheet_parser=(
+                    parse_rent_roll_workbook if kind == "rent_roll" else None
+                ),
+            )
+            for item in extractor.stream(
+                gcs_folder=gcs_folder, extraction_prompt=prompts[kind].EXTRACTION_PROMPT
+            ):
+                results.put((kind, item))
+        finally:
+            results.put(done)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(folders)) as executor:
+        futures = [
+            executor.submit(produce, kind, gcs_folder)
+            for kind, gcs_folder in folders.items()
+        ]
+        remaining = len(futures)
+        while remaining:
+            result = results.get()
+            if result is done:
+                remaining -= 1
+            else:
+                yield result
+        # Surface extraction errors once every producer has stopped
+        for future in futures:
+            future.result()
+
+
+def matcher_streaming_pipeline(id_mapped, tags_list):
+    """Streams extraction results straight into an IncrementalMatcher."""
+    BUCKET_NAME = "xtractrealestate"
+    folders = {
+        "lease": "lease_doc/",
+        "rent_roll": "rent_roll/",
+        "tax": "tax_returns/",
+    }
+
+    vertexai.init(project="sandbox-230010", location="us-central1")
+    rate_limiter = TokenBucket(REQUESTS_PER_MINUTE)
+    cache = ExtractionCache(EXTRACTION_CACHE_PATH)
+    try:
+        return IncrementalMatcher(id_mapped).consume(
+            stream_matcher_extractions(BUCKET_NAME, folders, rate_limiter, cache),
+            tags_list,
+        )
+    finally:
+        print(f"EXTRACTION CACHE: {cache.stats()}")
+        cache.close()
+
+
 if __name__ == "__main__":
     matcher_extraction_pipeline()
@@ -1,41 +1,21 @@
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import re
 import json
 import uuid
 import os
 
+import numpy as np
 
-def extract_year(date_string):
-    """Extracts the year from a date string using multiple formats."""
-
-    # List of common date formats to attempt parsing
-    date_formats = [
-        "%Y-%m-%d",
-        "%Y-%d-%m",
-        "%Y/%m/%d",
-        "%Y/%d/%m",  # Year first
-        "%m-%d-%Y",
-        "%d-%m-%Y",
-        "%m/%d/%Y",
-        "%d/%m/%Y",  # Month/Day/Year
-    ]
+import date_parsing
 
-    # Attempt parsing with strptime
-    for date_format in date_formats:
-        try:
-            date_object = datetime.strptime(date_string, date_format)
-            return date_object.year
-        except ValueError:
-            pass
 
-    # If none of the formats work, use regex to capture the first 4-digit year
-    year_pattern = r"\b(\d{4})\b"
-    year_match = re.search(year_pattern, date_string)
-    if year_match:
-        return int(year_match.group(1))
+def extract_year(date_string):
+    """Extracts the year from a date string using multiple formats."""
 
-    # Return None if no valid year could be extracted
-    return None
+    # Format sniffing and per-string memoization live in date_parsing
+    return date_parsing.extract_year(date_string)
 
 
 def validate_tax_data_new(
@@ -226,6 +206,41 @@ def validate_lease_to_rent_old(merged_data):
     return time_period_validator_report
 
 
+class LeaseIntervals:
+    """Lease periods of one address bucket, parsed once and sorted by start and end."""
+
+    def __init__(self, leases):
+        self.starts = date_parsing.to_datetime64(
+            [lease["data"]["start_date"] for lease in leases]
+        )
+        self.ends = date_parsing.to_datetime64(
+            [lease["data"]["end_date"] for lease in leases]
+        )
+        self.start_order = np.argsort(self.starts, kind="stable")
+        self.sorted_starts = self.starts[self.start_order]
+        self.end_order = np.argsort(self.ends, kind="stable")
+        self.sorted_ends = self.ends[self.end_order]
+
+    def covering(self, date):
+        """
+        Returns the indices of the leases whose period contains the date.
+
+        Both bounds are bisected: the leases that have started are a prefix of
+        the start order and those not yet ended a suffix of the end order. Only
+        the smaller of the two is filtered against the other bound, so a query
+        costs O(log n + min(started, not ended)) rather than a full scan. It is
+        not an interval tree, so that side can still be larger than the result.
+        """
+        date = np.datetime64(date, "D")
+        started_count = np.searchsorted(self.sorted_starts, date, side="right")
+        ended_count = np.searchsorted(self.sorted_ends, date, side="left")
+        if started_count <= len(self.ends) - ended_count:
+            started = self.start_order[:started_count]
+            return set(started[self.ends[started] >= date].tolist())
+        not_ended = self.end_order[ended_count:]
+        return set(not_ended[self.starts[not_ended] <= date].tolist())
+
+
 def validate_lease_to_rent_new(merged_data):
     """Validate the relevance of leases to rent rolls and return a structured report accordingly."""
 
@@ -260,10 +275,9 @@ def validate_lease_to_rent_new(merged_data):
                 }
                 continue
 
+            lease_intervals = None
             for rent_roll in rent_rolls:
-                rent_roll_date = datetime.strptime(
-                    rent_roll["data"]["date"], "%Y-%m-%d"
-                )
+                rent_roll_date = date_parsing.parse_iso_date(rent_roll["data"]["date"])
                 rent_roll_file_name = rent_roll.get("rent_key")
                 rent_roll_file_id = rent_roll.get("doc_id")
 
@@ -284,21 +298,18 @@ def validate_lease_to_rent_new(merged_data):
                     )
                     continue
 
-                for lease in leases:
-                    lease_start_date = datetime.strptime(
-                        lease["data"]["start_date"], "%Y-%m-%d"
-                    )
-                    lease_end_date = datetime.strptime(
-                        lease["data"]["end_date"], "%Y-%m-%d"
-                    )
+                # Lease dates are parsed once per bucket, not once per rent roll
+                if lease_intervals is None:
+                    lease_intervals = LeaseIntervals(leases)
+                covering = lease_intervals.covering(rent_roll_date)
+
+                for index, lease in enumerate(leases):
                     lease_file_name = lease.get("lease_key")
                     lease_id = lease.get("doc_id")
 
                     # Determine relevancy
                     relevancy_status = (
-                        "Relevant"
-                        if lease_start_date <= rent_roll_date <= lease_end_date
-                        else "Non-Relevant"
+                        "Relevant" if index in covering else "Non-Relevant"
                     )
 
                     issue_entry = {
@@ -310,12 +321,14 @@ def validate_lease_to_rent_new(merged_data):
                     }
 
                     if relevancy_status == "Non-Relevant":
+                        lease_start_date = lease_intervals.starts[index]
+                        lease_end_date = lease_intervals.ends[index]
                         issue_entry.update(
                             {
                                 "issue_id": uuid.uuid4().int % 1000,
                                 "issue_tag": "Time_Period_Validator",
                                 "issue_subtag": "lease_to_rent",
-                                "message": f"The submitted rent roll file, ({rent_roll_file_name}), for the lease, ({lease_file_name}) does not align with the lease period. The lease starts on {lease_start_date.date()} and ends on {lease_end_date.date()}, while the rent roll was prepared on {rent_roll_date.date()}. Please ensure the rent roll corresponds to the correct lease dates.",
+                                "message": f"The submitted rent roll file, ({rent_roll_file_name}), for the lease, ({lease_file_name}) does not align with the lease period. The lease starts on {lease_start_date} and ends on {lease_end_date}, while the rent roll was prepared on {rent_roll_date.date()}. Please ensure the rent roll corresponds to the correct lease dates.",
                             }
                         )
                         issues.append(issue_entry)  # Non-relevant goes into issues
@@ -334,6 +347,30 @@ def validate_lease_to_rent_new(merged_data):
     return time_period_validator_report
 
 
+def validate_lease_to_rent_sharded(merged_data, workers=1, shard_size=50):
+    """Validate lease-to-rent relevance with address shards spread over a process pool."""
+
+    addresses = list(merged_data.items())
+    if workers == 1 or len(addresses) <= shard_size:
+        return validate_lease_to_rent_new(merged_data)
+
+    shards = [
+        dict(addresses[start : start + shard_size])
+        for start in range(0, len(addresses), shard_size)
+    ]
+    time_period_validator_report = {}
+    # Spawned, not forked: this runs on validator threads, and a fork would copy
+    # locks (stage locks, the parse cache lock) that other threads may hold
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        # map keeps shard order, so the merged report has the serial key order
+        for shard_report in executor.map(validate_lease_to_rent_new, shards):
+            time_period_validator_report.update(shard_report)
+
+    return time_period_validator_report
+
+
 # def validate_rent_to_tax_new_old(rent_roll_data, tax_data):
 #     """Process rent roll data and categorize tax documents based on the rent year, including tax IDs."""
 
@@ -445,35 +482,67 @@ def validate_rent_to_tax_old(rent_roll_data, tax_data):
     return report
 
 
-def validate_rent_to_tax_new(rent_roll_data, tax_data):
-    """Process rent roll data and categorize tax documents based on the rent year, including tax IDs."""
+class TaxYearIndex:
+    """Tax documents parsed once and grouped by calendar year."""
+
+    def __init__(self, tax_data):
+        self.tax_years = [int(tax["calendar_year"]) for tax in tax_data]
+        self.tax_files_by_year = {}
+        for tax, tax_year in zip(tax_data, self.tax_years):
+            self.tax_files_by_year.setdefault(tax_year, []).append(
+                {"tax_file": tax["tax_file"], "doc_id": tax.get("doc_id")}
+            )
+
+
+def validate_rent_to_tax_new(rent_roll_data, tax_data, summarize=False):
+    """Process rent roll data and categorize tax documents based on the rent year, including tax IDs.
+
+    With summarize=True, tax files are listed once by year and each rent roll
+    only reports its relevant files and the non-matching years, so the
+    report grows linearly instead of with rent rolls x tax files.
+    """
 
     time_period_validator_report = (
         []
     )  # To store the full report, including details and issues
+    tax_index = None
 
     try:
-        # Loop through each rent roll data
+        # Validate rent dates
+        rent_dates = []
         for rent in rent_roll_data:
-            rent_key = rent["rent_key"]
-            rent_id = rent.get("doc_id")  # Rent roll doc ID
-
-            # Validate rent date
             rent_date = rent["data"].get("date")
             if not rent_date:
                 raise ValueError(
-                    f"Missing 'date' in rent roll data for rent_key: {rent_key}"
+                    f"Missing 'date' in rent roll data for rent_key: {rent['rent_key']}"
                 )
+            rent_dates.append(rent_date)
 
-            rent_year = extract_year(rent_date)  # Extract the year from the rent date
+        # Years of the whole rent roll date column, -1 where none was found
+        rent_years = date_parsing.extract_years(rent_dates).tolist()
+
+        # Loop through each rent roll data
+        for rent, rent_year in zip(rent_roll_data, rent_years):
+            rent_key = rent["rent_key"]
+            rent_id = rent.get("doc_id")  # Rent roll doc ID
+            if rent_year < 0:
+                rent_year = None
+
+            # Tax years are parsed once, on the first rent roll that needs them
+            if tax_index is None:
+                tax_index = TaxYearIndex(tax_data)
+
+            if summarize:
+                time_period_validator_report.append(
+                    summarize_rent_to_tax(rent_key, rent_id, rent_year, tax_index)
+                )
+                continue
 
             details = []  # To store relevant tax files for the current rent roll
             issues = []  # To store non-relevant tax files for the current rent roll
 
             # Loop through each tax record and generate an issue for each tax file
-            for tax in tax_data:
-                tax_year = int(tax["calendar_year"])
-
+            for tax, tax_year in zip(tax_data, tax_index.tax_years):
                 # Determine relevancy
                 relevancy_status = (
                     "Relevant" if rent_year == tax_year else "Non-Relevant"
@@ -515,10 +584,50 @@ def validate_rent_to_tax_new(rent_roll_data, tax_data):
     except Exception as e:
         raise ValueError(f"Error processing rent-to-tax data: {e}")
 
+    if summarize:
+        return {
+            "tax_files_by_year": tax_index.tax_files_by_year if tax_index else {},
+            "rent_rolls": time_period_validator_report,
+        }
+
     # Return the full time period validator report
     return time_period_validator_report
 
 
+def summarize_rent_to_tax(rent_key, rent_id, rent_year, tax_index):
+    """Summarize the tax files relevant to one rent roll using the year index."""
+
+    relevant_tax_files = tax_index.tax_files_by_year.get(rent_year, [])
+    non_relevant_tax_years = sorted(
+        tax_year for tax_year in tax_index.tax_files_by_year if tax_year != rent_year
+    )
+    summary = {
+        "rent_key": rent_key,
+        "rent_id": rent_id,
+        "rent_year": rent_year,
+        "relevant_tax_files": relevant_tax_files,
+        "non_relevant_tax_years": non_relevant_tax_years,
+        "issues": [],
+    }
+
+    if non_relevant_tax_years:
+        non_relevant_count = sum(
+            len(tax_index.tax_files_by_year[tax_year])
+            for tax_year in non_relevant_tax_years
+        )
+        summary["issues"].append(
+            {
+                "issue_id": int(uuid.uuid4().int % 1000),
+                "issue_tag": "Time_Period_Validator",
+                "issue_subtag": "Rent-to-Tax",
+                "non_relevant_tax_count": non_relevant_count,
+                "message": f"{non_relevant_count} submitted tax file(s) from year(s) {', '.join(map(str, non_relevant_tax_years))} do not align with the rent roll file ({rent_key}). The rent roll year ({rent_year}) and tax year must match. Please upload the correct tax file that aligns with the rent roll year.",
+            }
+        )
+
+    return summary
+
+
 def transform_address_bucket(address_bucket):
     transformed_data = []
 
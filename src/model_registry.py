@@ -0,0 +1,47 @@
+import threading
+
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(model_name=DEFAULT_MODEL_NAME, device="cpu"):
+    """
+    Returns the process-wide SentenceTransformer, loading it on first use.
+
+    Args:
+        model_name (str): The sentence-transformers model to be loaded.
+        device (str): The device the model runs on.
+
+    Returns:
+        SentenceTransformer: The shared model instance.
+    """
+    key = (model_name, device)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+
+                model = SentenceTransformer(model_name, device=device)
+                _models[key] = model
+    return model
+
+
+def warm_up(model_name=DEFAULT_MODEL_NAME, device="cpu"):
+    """
+    Loads the model and runs one encode call so the first request doesn't pay for it.
+
+    Args:
+        model_name (str): The sentence-transformers model to be loaded.
+        device (str): The device the model runs on.
+
+    Returns:
+        SentenceTransformer: The shared model instance.
+    """
+    model = get_model(model_name, device)
+    model.encode(["warm up"])
+    return model
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+import usaddress
+
+
+class ParseCache:
+    def __init__(self, maxsize=100000):
+        """
+        Bounded LRU cache of usaddress.tag results keyed by the raw address string.
+
+        Addresses that raise RepeatedLabelError are cached as negative entries
+        so the CRF tagger never runs twice on the same input.
+
+        Args:
+            maxsize (int): Maximum number of cached addresses.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def tag(self, address):
+        """
+        Cached equivalent of usaddress.tag.
+
+        Args:
+            address (str): The address to be parsed.
+
+        Returns:
+            tuple: A copy of the tagged components and the address type.
+
+        Raises:
+            usaddress.RepeatedLabelError: If the address cannot be parsed.
+        """
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is not None:
+                self._entries.move_to_end(address)
+                if isinstance(entry, usaddress.RepeatedLabelError):
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            try:
+                entry = usaddress.tag(address)
+            except usaddress.RepeatedLabelError as e:
+                entry = e
+            with self._lock:
+                self._entries[address] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        if isinstance(entry, usaddress.RepeatedLabelError):
+            raise entry.with_traceback(None)
+        tagged, address_type = entry
+        return tagged.copy(), address_type
+
+    def stats(self):
+        """Returns the hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Drops every cached parse and resets the counters, e.g. between deals."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.negative_hits = self.misses = 0
+
+
+parse_cache = ParseCache()
+
+
+def tag_address(address):
+    return parse_cache.tag(address)
+
+
+def clear_parse_cache():
+    parse_cache.clear()
@@ -0,0 +1,170 @@
+import sys
+
+import numpy as np
+import usaddress
+
+from parse_cache import tag_address
+
+
+COMPONENT_LABELS = (
+    "AddressNumber",
+    "StreetNamePreDirectional",
+    "StreetName",
+    "StreetNamePostType",
+    "OccupancyType",
+    "OccupancyIdentifier",
+    "PlaceName",
+    "StateName",
+    "ZipCode",
+)
+
+
+class ParsedAddress:
+    __slots__ = COMPONENT_LABELS
+
+    def __init__(self, **components):
+        """
+        Compact record of the usaddress components the pipeline uses.
+
+        Component strings are interned, so repeated street names, cities and
+        states share one object across a batch. Missing components are None.
+
+        Args:
+            **components: usaddress labels mapped to their values.
+        """
+        for label in COMPONENT_LABELS:
+            value = components.get(label)
+            setattr(self, label, sys.intern(value) if value else None)
+
+    @classmethod
+    def from_tagged(cls, tagged):
+        """Builds a record from a usaddress.tag component mapping."""
+        return cls(**{label: tagged.get(label) for label in COMPONENT_LABELS})
+
+    @classmethod
+    def from_address(cls, address):
+        """
+        Parses an address through the shared parse cache.
+
+        Args:
+            address (str): The address to be parsed.
+
+        Returns:
+            ParsedAddress: The parsed record.
+
+        Raises:
+            usaddress.RepeatedLabelError: If the address cannot be parsed.
+        """
+        return cls.from_tagged(tag_address(address)[0])
+
+    def get(self, label, default=None):
+        """dict-style access so records can stand in for usaddress output."""
+        value = getattr(self, label, None)
+        return default if value is None else value
+
+    @property
+    def block_key(self):
+        return self.AddressNumber, self.ZipCode
+
+    def __repr__(self):
+        components = ", ".join(
+            f"{label}={getattr(self, label)!r}"
+            for label in COMPONENT_LABELS
+            if getattr(self, label) is not None
+        )
+        return f"ParsedAddress({components})"
+
+
+class ParsedAddressBatch:
+    def __init__(self, addresses, records, errors):
+        """
+        Columnar view over many parsed addresses.
+
+        Each component label has one list column. AddressNumber and ZipCode are
+        also kept as NumPy string arrays (missing values as "") so house-number
+        and ZIP equality can be checked for many pairs at once.
+
+        Args:
+            addresses (list): The raw addresses, one per row.
+            records (list): The ParsedAddress for each row, or None on parse errors.
+            errors (list): The parse error for each row, or None.
+        """
+        self.addresses = list(addresses)
+        self.records = list(records)
+        self.errors = list(errors)
+        self.columns = {
+            label: [record.get(label) if record else None for record in self.records]
+            for label in COMPONENT_LABELS
+        }
+        self.address_numbers = np.array(
+            [value or "" for value in self.columns["AddressNumber"]], dtype=str
+        )
+        self.zip_codes = np.array(
+            [value or "" for value in self.columns["ZipCode"]], dtype=str
+        )
+        self.parsed_mask = np.array(
+            [record is not None for record in self.records], dtype=bool
+        )
+
+    @classmethod
+    def from_addresses(cls, addresses, parser=ParsedAddress.from_address):
+        """
+        Parses addresses into a batch, recording parse errors per row.
+
+        Args:
+            addresses (iterable): The addresses to be parsed.
+            parser (callable): Turns one address into a ParsedAddress.
+
+        Returns:
+            ParsedAddressBatch: The parsed batch.
+        """
+        addresses = list(addresses)
+        records, errors = [], []
+        for address in addresses:
+            try:
+                records.append(parser(address))
+                errors.append(None)
+            except usaddress.RepeatedLabelError as e:
+                records.append(None)
+                errors.append(e)
+        return cls(addresses, records, errors)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def block_keys(self):
+        """Returns the (AddressNumber, ZipCode) key of each row, or None on errors."""
+        return [record.block_key if record else None for record in self.records]
+
+    def pair_equality(self, left, right, other=None):
+        """
+        Checks house-number and ZIP equality for many row pairs at once.
+
+        Args:
+            left (array-like): Row indices into this batch.
+            right (array-like): Row indices into `other` (defaults to this batch).
+            other (ParsedAddressBatch): The batch the right indices refer to.
+
+        Returns:
+            numpy.ndarray: A boolean array, True where both components match.
+        """
+        other = self if other is None else other
+        left = np.asarray(left, dtype=np.intp)
+        right = np.asarray(right, dtype=np.intp)
+        return (self.address_numbers[left] == other.address_numbers[right]) & (
+            self.zip_codes[left] == other.zip_codes[right]
+        )
+
+    def equality_matrix(self, other):
+        """
+        Checks house-number and ZIP equality for every row pair of two batches.
+
+        Args:
+            other (ParsedAddressBatch): The batch to compare against.
+
+        Returns:
+            numpy.ndarray: A len(self) x len(other) boolean matrix.
+        """
+        return (self.address_numbers[:, None] == other.address_numbers[None, :]) & (
+            self.zip_codes[:, None] == other.zip_codes[None, :]
+        )
@@ -0,0 +1,69 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(
+        self, requests_per_minute, capacity=1, clock=time.monotonic, sleep=time.sleep
+    ):
+        """
+        Thread-safe token bucket limiting how often calls may start.
+
+        Args:
+            requests_per_minute (float): Sustained number of calls allowed per minute.
+            capacity (int): Maximum burst of calls allowed after an idle period.
+            clock (callable): Monotonic clock in seconds, injectable for tests.
+            sleep (callable): Sleep function, injectable for tests.
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def retry_with_backoff(
+    call, retry_on, max_retries=5, base_delay=1.0, max_delay=60.0, sleep=time.sleep
+):
+    """
+    Calls `call` and retries it with exponential backoff and full jitter.
+
+    Args:
+        call (callable): The zero-argument function to be called.
+        retry_on (tuple): Exception types that are worth retrying (throttling,
+            temporary unavailability). Anything else is raised immediately.
+        max_retries (int): Retries after the first attempt before giving up.
+        base_delay (float): Upper bound of the first backoff delay in seconds.
+        max_delay (float): Cap on any single backoff delay in seconds.
+        sleep (callable): Sleep function, injectable for tests.
+
+    Returns:
+        The return value of `call`.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            print(f"Retrying after {type(e).__name__} in {delay:.1f}s")
+            sleep(delay)
@@ -0,0 +1,233 @@
+import io
+import itertools
+import re
+from collections import Counter
+from datetime import date, datetime
+
+import openpyxl
+from dateutil import parser as date_parser
+
+import date_parsing
+
+# Rows searched for the header row
+HEADER_SCAN_ROWS = 30
+
+# Normalized header cells that name each column
+UNIT_HEADERS = {
+    "unit",
+    "units",
+    "unit no",
+    "unit number",
+    "unit id",
+    "apt",
+    "apt no",
+    "apartment",
+    "apartment no",
+    "apartment number",
+    "suite",
+    "space",
+}
+ADDRESS_HEADERS = {"address", "property address", "street address"}
+STATUS_HEADERS = {"tenant", "tenant name", "resident", "resident name", "status"}
+
+# Status/tenant cells and unit-column labels that do not stand for an occupied unit
+VACANT_VALUES = {"vacant", "vacancy", "model", "down", "admin"}
+SUMMARY_PREFIXES = ("total", "subtotal", "grand total", "summary")
+
+_HEADER_CLEANUP = re.compile(r"[^a-z0-9 ]+")
+_ADDRESS = re.compile(
+    r"\b\d+[A-Za-z]?\s+[A-Za-z0-9 .'#-]+?,?\s+[A-Za-z .'-]+,?\s+[A-Z]{2},?\s+"
+    r"\d{5}(?:-\d{4})?\b"
+)
+_NUMERIC_DATE = re.compile(r"\b\d{1,4}[-/]\d{1,2}[-/]\d{2,4}\b")
+_WORDED_DATE = re.compile(
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+    r"\s+\d{1,2},?\s+\d{4}\b",
+    re.IGNORECASE,
+)
+_OWNER_LABEL = re.compile(
+    r"^\s*(?:property\s+)?owner(?:\s+name)?\s*:?\s*", re.IGNORECASE
+)
+
+
+def normalize_header(value):
+    return " ".join(_HEADER_CLEANUP.sub(" ", str(value).lower()).split())
+
+
+def format_unit(value):
+    """Turns a unit cell into the string the LLM path would emit."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def find_date(value):
+    """Returns a YYYY-MM-DD date found in a cell, or None."""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    if not isinstance(value, str):
+        return None
+    match = _NUMERIC_DATE.search(value)
+    if match:
+        parsed = date_parsing.parse_date(match.group(0))
+        if parsed:
+            return parsed.strftime("%Y-%m-%d")
+    match = _WORDED_DATE.search(value)
+    if match:
+        try:
+            return date_parser.parse(match.group(0)).strftime("%Y-%m-%d")
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+def find_header(rows):
+    """
+    Finds the header row and the unit, address and status columns in it.
+
+    Args:
+        rows (list): The first rows of the sheet, as value tuples.
+
+    Returns:
+        tuple: (row index, {"unit": col, "address": col, "status": col}), or
+            (None, {}) when no row names a unit column.
+    """
+    best = (None, {})
+    for row_index, row in enumerate(rows):
+        columns = {}
+        for col, value in enumerate(row):
+            if value is None:
+                continue
+            header = normalize_header(value)
+            if header in UNIT_HEADERS:
+                columns.setdefault("unit", col)
+            elif header in ADDRESS_HEADERS:
+                columns.setdefault("address", col)
+            elif header in STATUS_HEADERS:
+                columns.setdefault("status", col)
+        if "unit" in columns and len(columns) > len(best[1]):
+            best = (row_index, columns)
+    return best
+
+
+def read_rent_roll(source):
+    """
+    Reads a rent roll workbook without the LLM.
+
+    The workbook is streamed in read-only mode. The header row is the one
+    among the first HEADER_SCAN_ROWS that names a unit column (and most other
+    known columns). Units are read below it, skipping empty, vacant and total
+    rows. The property address is an address-shaped cell above the header or,
+    failing that, the most common address-shaped cell of an address column;
+    cells without a street, city, state and ZIP do not count. The report date
+    and owner come from the cells above the header.
+
+    Args:
+        source (bytes or str): Workbook content or path.
+
+    Returns:
+        tuple: (result, confidence). result has the rent_roll_prompt output
+            shape; confidence is in [0, 1]: 0.5 for the unit column and its
+            units, 0.25 each for the address and the date.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        best_result, best_confidence = None, -1
+        for sheet in workbook.worksheets:
+            result, confidence = read_sheet(sheet)
+            if confidence > best_confidence:
+                best_result, best_confidence = result, confidence
+        return best_result, max(best_confidence, 0)
+    finally:
+        workbook.close()
+
+
+def read_sheet(sheet):
+    rows = sheet.iter_rows(values_only=True)
+    head = []
+    for row in rows:
+        head.append(row)
+        if len(head) == HEADER_SCAN_ROWS:
+            break
+    header_index, columns = find_header(head)
+
+    owner = address = report_date = None
+    for row in head[:header_index]:
+        cells = [value for value in row if value not in (None, "")]
+        for position, value in enumerate(cells):
+            report_date = report_date or find_date(value)
+            if not isinstance(value, str):
+                continue
+            match = _ADDRESS.search(value)
+            if match and address is None:
+                address = match.group(0).strip()
+            if owner is None and _OWNER_LABEL.match(value):
+                remainder = _OWNER_LABEL.sub("", value).strip()
+                if not remainder and position + 1 < len(cells):
+                    remainder = str(cells[position + 1]).strip()
+                owner = remainder or None
+
+    units = []
+    addresses = Counter()
+    if header_index is not None:
+        unit_col = columns["unit"]
+        # Rows after the header come from the head buffer, then the stream
+        for row in itertools.chain(head[header_index + 1 :], rows):
+            if unit_col >= len(row) or row[unit_col] in (None, ""):
+                continue
+            unit = format_unit(row[unit_col])
+            if unit.lower().startswith(SUMMARY_PREFIXES):
+                continue
+            if "status" in columns and columns["status"] < len(row):
+                status = row[columns["status"]]
+                if isinstance(status, str) and status.strip().lower() in VACANT_VALUES:
+                    continue
+            if "address" in columns and columns["address"] < len(row):
+                row_address = row[columns["address"]]
+                match = (
+                    _ADDRESS.search(row_address)
+                    if isinstance(row_address, str)
+                    else None
+                )
+                if match:
+                    addresses[match.group(0).strip()] += 1
+            units.append(unit)
+
+    if address is None and addresses:
+        address = addresses.most_common(1)[0][0]
+    units = list(dict.fromkeys(units))
+
+    confidence = (
+        (0.5 if units else 0)
+        + (0.25 if address else 0)
+        + (0.25 if report_date else 0)
+    )
+    result = {
+        "property_owner_name": owner or "N/A",
+        "property_address": address or "N/A",
+        "unit_numbers": str(units),
+        "date": report_date or "N/A",
+    }
+    return result, confidence
+
+
+def parse_rent_roll_workbook(source, min_confidence=1.0):
+    """
+    Parses a structured rent roll workbook locally.
+
+    Args:
+        source (bytes or str): Workbook content or path.
+        min_confidence (float): Confidence below which the caller should fall
+            back to the LLM.
+
+    Returns:
+        dict: The rent_roll_prompt-shaped result, or None on low confidence.
+    """
+    try:
+        result, confidence = read_rent_roll(source)
+    except Exception as e:
+        print(f"Local rent roll parsing failed: {e}")
+        return None
+    return result if confidence >= min_confidence else None
@@ -0,0 +1,68 @@
+import re
+import sys
+from functools import lru_cache
+
+
+# Words that only say "this is a unit" and carry no identity of their own
+UNIT_DESIGNATORS = frozenset(
+    ["apartment", "apt", "unit", "suite", "ste", "room", "rm", "number", "no"]
+)
+
+_TOKEN_SEPARATORS = re.compile(r"[\s#.,:;_\-]+")
+_ATTACHED_DESIGNATOR = re.compile(
+    r"^(?:apartment|apt|unit|suite|ste|room|rm|no)(?=\d)"
+)
+_LEADING_ZEROS = re.compile(r"(?<!\d)0+(?=\d)")
+
+
+@lru_cache(maxsize=65536)
+def canonical_unit(unit):
+    """
+    Returns the canonical key of a unit number, so "Apt 2B", "#2b", "2-B",
+    "Unit 02B" and "2B" all compare equal.
+
+    The value is lowercased and split on separators and leading designator
+    words (apt, unit, suite, ...) are dropped. The rest is joined back without
+    separators, except between two numbers, which keep a "-" so "1-10" and
+    "110" stay apart. Leading zeros are then removed from numbers. Keys are
+    interned.
+
+    Args:
+        unit (str or int): The unit number as extracted.
+
+    Returns:
+        str: The canonical unit key.
+    """
+    raw = str(unit).strip().lower()
+    tokens = [token for token in _TOKEN_SEPARATORS.split(raw) if token]
+    while len(tokens) > 1 and tokens[0] in UNIT_DESIGNATORS:
+        tokens.pop(0)
+    key = tokens[0] if tokens else ""
+    for token in tokens[1:]:
+        if key[-1].isdigit() and token[0].isdigit():
+            key += "-"
+        key += token
+    key = _ATTACHED_DESIGNATOR.sub("", key)
+    key = _LEADING_ZEROS.sub("", key)
+    return sys.intern(key or raw)
+
+
+def canonical_units(units):
+    """Returns the canonical key of each unit, in order."""
+    return [canonical_unit(unit) for unit in units]
+
+
+def canonical_unit_map(units):
+    """
+    Maps the canonical key of each unit to the first spelling seen for it.
+
+    Args:
+        units (iterable): Unit numbers as extracted.
+
+    Returns:
+        dict: Canonical key to original unit value.
+    """
+    unit_map = {}
+    for unit in units:
+        unit_map.setdefault(canonical_unit(unit), unit)
+    return unit_map
@@ -3,9 +3,15 @@ import ast
 import pdfkit
 from xlsx2html import xlsx2html
 import io, os
+import tempfile
 import fitz
 import re
 
+import address_normalization
+
+# Raised by fitz for empty, truncated or otherwise unreadable PDF data
+PDF_ERRORS = (fitz.EmptyFileError, fitz.FileDataError)
+
 
 def load_json_file(file_path):
     with open(file_path, "r") as file:
@@ -30,11 +36,8 @@ def normalize_string(s):
 
 
 def normalize_address(address):
-    # Remove commas, spaces, and convert to lowercase
-    normalized_address = re.sub(r"(\b[a-z]{2}\b),\1", r"\1", address)
-    normalized_address = re.sub(r"[\s,]", "", address.lower())
-    normalized_address = re.sub(r"[\s,.]", "", address.lower())
-    return normalized_address
+    # Remove commas, periods, spaces, and convert to lowercase
+    return address_normalization.normalize(address)
 
 
 def remove_empty_pages(pdf_path, output_pdf_path):
@@ -63,6 +66,53 @@ def remove_empty_pages(pdf_path, output_pdf_path):
     # print(f"Empty pages removed. New PDF saved at: {output_pdf_path}")
 
 
+def extract_pdf_text(pdf_bytes, min_chars_per_page=100, max_pages=None, pages=None):
+    """
+    Returns the text layer of a text-native PDF, or None for scanned documents.
+
+    A page counts as scanned when it carries images but fewer than
+    min_chars_per_page characters of text. One scanned page sends the whole
+    document down the regular PDF path, so no content is lost.
+
+    Args:
+        pdf_bytes (bytes): The PDF file content.
+        min_chars_per_page (int): Text needed for an image page to count as text.
+        max_pages (int): Optional cap on the number of non-empty pages returned.
+        pages (range): Optional zero-based page range to read instead of all pages.
+
+    Returns:
+        str: The page texts, each under a "--- Page N ---" marker, or None.
+    """
+    page_texts = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        for page_num in pages if pages is not None else range(pdf_document.page_count):
+            page = pdf_document[page_num]
+            text = page.get_text().strip()
+            if len(text) < min_chars_per_page and page.get_images():
+                return None
+            if text:
+                page_texts.append(f"--- Page {page_num + 1} ---\n{text}")
+
+    if not page_texts:
+        return None
+    return "\n\n".join(page_texts[:max_pages])
+
+
+def pdf_page_count(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return pdf_document.page_count
+
+
+def slice_pdf(pdf_bytes, pages):
+    """Returns a new PDF holding only the given zero-based page range."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        with fitz.open() as chunk:
+            chunk.insert_pdf(
+                pdf_document, from_page=pages.start, to_page=pages.stop - 1
+            )
+            return chunk.tobytes()
+
+
 def excel_to_pdf(excel_path):
     # Convert Excel to HTML and store in a StringIO object
     html_stream = io.StringIO()
@@ -71,13 +121,15 @@ def excel_to_pdf(excel_path):
     # Get the HTML content as a string
     html_content = html_stream.getvalue()
 
-    # Save HTML content to a temporary file
-    temp_html_file = "temp.html"
+    # Save HTML content to a temporary file next to the workbook, so
+    # concurrent conversions don't overwrite each other's files
+    temp_base = os.path.splitext(excel_path)[0]
+    temp_html_file = f"{temp_base}.temp.html"
     with open(temp_html_file, "w", encoding="utf-8") as f:
         f.write(html_content)
 
     # Convert HTML to PDF using pdfkit
-    temp_pdf_file = "temp.pdf"  # pdf file with empty pages
+    temp_pdf_file = f"{temp_base}.temp.pdf"  # pdf file with empty pages
     pdfkit.from_file(temp_html_file, temp_pdf_file)
 
     pdf_path = excel_path.replace(".xlsx", ".pdf")
@@ -87,3 +139,14 @@ def excel_to_pdf(excel_path):
     # Delete the temporary HTML file
     os.remove(temp_html_file)
     os.remove(temp_pdf_file)
+    return pdf_path
+
+
+def excel_bytes_to_pdf(excel_bytes):
+    """Converts workbook content to PDF bytes with excel_to_pdf in a temp directory."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        excel_path = os.path.join(temp_dir, "workbook.xlsx")
+        with open(excel_path, "wb") as f:
+            f.write(excel_bytes)
+        with open(excel_to_pdf(excel_path), "rb") as f:
+            return f.read()